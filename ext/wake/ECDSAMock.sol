@@ -0,0 +1,64 @@
+// SPDX-License-Identifier: MIT
+import "src/utils/ECDSA.sol";
+
+contract ECDSAMock {
+    function recover(bytes32 hash, bytes memory signature) external view returns (address) {
+        return ECDSA.recover(hash, signature);
+    }
+
+    function recoverCalldata(bytes32 hash, bytes calldata signature) external view returns (address) {
+        return ECDSA.recoverCalldata(hash, signature);
+    }
+
+    function recover(bytes32 hash, bytes32 r, bytes32 vs) external view returns (address) {
+        return ECDSA.recover(hash, r, vs);
+    }
+
+    function recover(bytes32 hash, uint8 v, bytes32 r, bytes32 s) external view returns (address) {
+        return ECDSA.recover(hash, v, r, s);
+    }
+
+    function tryRecover(bytes32 hash, bytes memory signature) external view returns (address) {
+        return ECDSA.tryRecover(hash, signature);
+    }
+
+    function tryRecoverCalldata(bytes32 hash, bytes calldata signature) external view returns (address) {
+        return ECDSA.tryRecoverCalldata(hash, signature);
+    }
+
+    function tryRecover(bytes32 hash, bytes32 r, bytes32 vs) external view returns (address) {
+        return ECDSA.tryRecover(hash, r, vs);
+    }
+
+    function tryRecover(bytes32 hash, uint8 v, bytes32 r, bytes32 s) external view returns (address) {
+        return ECDSA.tryRecover(hash, v, r, s);
+    }
+
+    function canonicalHash(bytes memory signature) external pure returns (bytes32) {
+        return ECDSA.canonicalHash(signature);
+    }
+
+    function canonicalHashCalldata(bytes calldata signature) external pure returns (bytes32) {
+        return ECDSA.canonicalHashCalldata(signature);
+    }
+
+    function canonicalHash(bytes32 r, bytes32 vs) external pure returns (bytes32) {
+        return ECDSA.canonicalHash(r, vs);
+    }
+
+    function canonicalHash(uint8 v, bytes32 r, bytes32 s) external pure returns (bytes32) {
+        return ECDSA.canonicalHash(v, r, s);
+    }
+
+    // tryRecover of every (hashes[i], signatures[i]) in one call.
+    function tryRecoverBatch(bytes32[] calldata hashes, bytes[] calldata signatures)
+        external
+        view
+        returns (address[] memory results)
+    {
+        results = new address[](hashes.length);
+        for (uint256 i; i < hashes.length; ++i) {
+            results[i] = ECDSA.tryRecoverCalldata(hashes[i], signatures[i]);
+        }
+    }
+}
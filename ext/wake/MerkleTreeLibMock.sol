@@ -0,0 +1,46 @@
+// SPDX-License-Identifier: MIT
+
+import "src/utils/MerkleTreeLib.sol";
+
+contract MerkleTreeLibMock {
+    function build(bytes32[] memory leaves) external pure returns (bytes32[] memory) {
+        return MerkleTreeLib.build(leaves);
+    }
+
+    function root(bytes32[] memory tree) external pure returns (bytes32) {
+        return MerkleTreeLib.root(tree);
+    }
+
+    function leaf(bytes32[] memory tree, uint256 leafIndex) external pure returns (bytes32) {
+        return MerkleTreeLib.leaf(tree, leafIndex);
+    }
+
+    function leafProof(bytes32[] memory tree, uint256 leafIndex) external pure returns (bytes32[] memory) {
+        return MerkleTreeLib.leafProof(tree, leafIndex);
+    }
+
+    function nodeProof(bytes32[] memory tree, uint256 nodeIndex) external pure returns (bytes32[] memory) {
+        return MerkleTreeLib.nodeProof(tree, nodeIndex);
+    }
+
+    function multiProofForLeaves(bytes32[] memory tree, uint256[] memory leafIndices) external pure returns (bytes32[] memory proof, bool[] memory flags) {
+        return MerkleTreeLib.multiProofForLeaves(tree, leafIndices);
+    }
+
+    function pad(bytes32[] memory leaves, bytes32 defaultFill) external pure returns (bytes32[] memory) {
+        return MerkleTreeLib.pad(leaves, defaultFill);
+    }
+
+    function buildGas(bytes32[] memory leaves) external view returns (bytes32 root_, uint256 gasUsed) {
+        uint256 gasBefore = gasleft();
+        bytes32[] memory tree = MerkleTreeLib.build(leaves);
+        gasUsed = gasBefore - gasleft();
+        root_ = MerkleTreeLib.root(tree);
+    }
+
+    function leafProofGas(bytes32[] memory tree, uint256 leafIndex) external view returns (bytes32[] memory proof, uint256 gasUsed) {
+        uint256 gasBefore = gasleft();
+        proof = MerkleTreeLib.leafProof(tree, leafIndex);
+        gasUsed = gasBefore - gasleft();
+    }
+}
@@ -0,0 +1,45 @@
+// SPDX-License-Identifier: MIT
+
+import "src/utils/P256.sol";
+
+contract P256Mock {
+    function verifySignature(bytes32 hash, bytes32 r, bytes32 s, bytes32 x, bytes32 y) external view returns (bool) {
+        return P256.verifySignature(hash, r, s, x, y);
+    }
+
+    function verifySignatureAllowMalleability(bytes32 hash, bytes32 r, bytes32 s, bytes32 x, bytes32 y) external view returns (bool) {
+        return P256.verifySignatureAllowMalleability(hash, r, s, x, y);
+    }
+
+    // Verifies every (hashes[i], rs[i], ss[i], xs[i], ys[i]) in one call.
+    function verifySignatures(
+        bytes32[] calldata hashes,
+        bytes32[] calldata rs,
+        bytes32[] calldata ss,
+        bytes32[] calldata xs,
+        bytes32[] calldata ys,
+        bool allowMalleability
+    ) external view returns (bool[] memory results) {
+        results = new bool[](hashes.length);
+        for (uint256 i; i < hashes.length; ++i) {
+            results[i] = allowMalleability
+                ? P256.verifySignatureAllowMalleability(hashes[i], rs[i], ss[i], xs[i], ys[i])
+                : P256.verifySignature(hashes[i], rs[i], ss[i], xs[i], ys[i]);
+        }
+    }
+
+    // Gas of a single verifySignature, excluding the call overhead.
+    function verifySignatureGas(bytes32 hash, bytes32 r, bytes32 s, bytes32 x, bytes32 y) external view returns (bool isValid, uint256 gasUsed) {
+        gasUsed = gasleft();
+        isValid = P256.verifySignature(hash, r, s, x, y);
+        gasUsed -= gasleft();
+    }
+
+    function hasPrecompile() external view returns (bool) {
+        return P256.hasPrecompile();
+    }
+
+    function hasPrecompileOrVerifier() external view returns (bool) {
+        return P256.hasPrecompileOrVerifier();
+    }
+}
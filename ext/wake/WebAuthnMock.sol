@@ -0,0 +1,77 @@
+// SPDX-License-Identifier: MIT
+
+import "src/utils/P256.sol";
+import "src/utils/WebAuthn.sol";
+
+contract WebAuthnMock {
+    function verify(
+        bytes memory challenge,
+        bool requireUserVerification,
+        WebAuthn.WebAuthnAuth memory auth,
+        bytes32 x,
+        bytes32 y
+    ) external view returns (bool) {
+        return WebAuthn.verify(challenge, requireUserVerification, auth, x, y);
+    }
+
+    // Verifies an `abi.encode(auth)` encoded auth.
+    function verifyEncoded(
+        bytes memory challenge,
+        bool requireUserVerification,
+        bytes memory encodedAuth,
+        bytes32 x,
+        bytes32 y
+    ) external view returns (bool) {
+        return WebAuthn.verify(challenge, requireUserVerification, WebAuthn.tryDecodeAuth(encodedAuth), x, y);
+    }
+
+    // Verifies a compact encoded auth, decoded from memory.
+    function verifyCompact(
+        bytes memory challenge,
+        bool requireUserVerification,
+        bytes memory encodedAuth,
+        bytes32 x,
+        bytes32 y
+    ) external view returns (bool) {
+        return WebAuthn.verify(challenge, requireUserVerification, WebAuthn.tryDecodeAuthCompact(encodedAuth), x, y);
+    }
+
+    // Verifies a compact encoded auth, decoded from calldata.
+    function verifyCompactCalldata(
+        bytes calldata challenge,
+        bool requireUserVerification,
+        bytes calldata encodedAuth,
+        bytes32 x,
+        bytes32 y
+    ) external view returns (bool) {
+        return WebAuthn.verify(challenge, requireUserVerification, WebAuthn.tryDecodeAuthCompactCalldata(encodedAuth), x, y);
+    }
+
+    function encodeAuth(WebAuthn.WebAuthnAuth memory auth) external pure returns (bytes memory) {
+        return WebAuthn.encodeAuth(auth);
+    }
+
+    function tryDecodeAuth(bytes memory encodedAuth) external pure returns (WebAuthn.WebAuthnAuth memory) {
+        return WebAuthn.tryDecodeAuth(encodedAuth);
+    }
+
+    function tryEncodeAuthCompact(WebAuthn.WebAuthnAuth memory auth) external pure returns (bytes memory) {
+        return WebAuthn.tryEncodeAuthCompact(auth);
+    }
+
+    function tryDecodeAuthCompact(bytes memory encodedAuth) external pure returns (WebAuthn.WebAuthnAuth memory) {
+        return WebAuthn.tryDecodeAuthCompact(encodedAuth);
+    }
+
+    function tryDecodeAuthCompactCalldata(bytes calldata encodedAuth) external pure returns (WebAuthn.WebAuthnAuth memory) {
+        return WebAuthn.tryDecodeAuthCompactCalldata(encodedAuth);
+    }
+
+    function hasPrecompile() external view returns (bool) {
+        return P256.hasPrecompile();
+    }
+
+    function hasPrecompileOrVerifier() external view returns (bool) {
+        return P256.hasPrecompileOrVerifier();
+    }
+}
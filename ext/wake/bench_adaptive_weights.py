@@ -0,0 +1,57 @@
+import statistics
+from collections import defaultdict
+
+from wake.testing import *
+
+from .fuzz_runner import run_sequence, seed_sequence
+from .test_erc1155_fuzz import ERC1155FuzzTest
+from .test_erc721_fuzz import ERC721FuzzTest
+from .utils import format_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_adaptive_weights.py -s`.
+
+FLOWS = 1_000
+SEEDS = range(5)
+
+
+def _first_seen(test_class, adaptive: bool, seed: int) -> dict:
+    with test_class() as test:
+        test.adaptive = adaptive
+        test.setup_fixtures()
+        snapshot = default_chain.snapshot()
+        seed_sequence(seed)
+        try:
+            run_sequence(test, 0, FLOWS, defaultdict(lambda: defaultdict(int)), [])
+        finally:
+            default_chain.revert(snapshot)
+    return test.first_seen
+
+
+@default_chain.connect(accounts=20)
+def test_adaptive_weights():
+    rows = []
+    for test_class in (ERC1155FuzzTest, ERC721FuzzTest):
+        for adaptive in (False, True):
+            combinations = []
+            reverts = []
+            first_revert_steps = []
+            for seed in SEEDS:
+                first_seen = _first_seen(test_class, adaptive, seed)
+                combinations.append(len(first_seen))
+                revert_steps = {}
+                for (_, revert, _), step in first_seen.items():
+                    if revert is not None:
+                        revert_steps[revert] = min(step, revert_steps.get(revert, step))
+                reverts.append(len(revert_steps))
+                first_revert_steps.extend(revert_steps.values())
+
+            rows.append((
+                test_class.__name__,
+                "adaptive" if adaptive else "static",
+                statistics.mean(combinations),
+                statistics.mean(reverts),
+                statistics.median(first_revert_steps) if first_revert_steps else "-",
+            ))
+
+    print()
+    print(format_table(("test", "weights", f"combinations / {FLOWS} flows", "revert kinds", "median first-hit step"), rows))
@@ -0,0 +1,62 @@
+import time
+
+from wake.testing import *
+from pytypes.tests.ERC1155Mock import ERC1155Mock
+from pytypes.tests.MerkleProofMock import MerkleProofMock
+
+from .chain_transport import connect_ipc
+from .fuzz_runner import run_seeded
+from .test_erc1155_fuzz import ERC1155FuzzTest
+from .utils import MerkleTree, format_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_chain_transport.py -s`.
+# Compares wake's default websocket connection to anvil with a unix socket (chain_transport.connect_ipc)
+# on the same calls, the EVM work is identical so the difference is the transport overhead. Both
+# connect to an external anvil over JSON-RPC, there is no in-process backend to compare against.
+
+CALLS = 2_000
+TXS = 500
+FUZZ_FLOWS = 300
+
+
+def _per_second(count: int, fn) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return count / (time.perf_counter() - start)
+
+
+def _measure() -> tuple:
+    tree = MerkleTree()
+    for i in range(256):
+        tree.add_leaf(i.to_bytes(32, "big"))
+    proof = tree.get_proof(17)
+    leaf = keccak256(tree.values[17])
+
+    merkle_proof = MerkleProofMock.deploy()
+    calls = _per_second(CALLS, lambda _: merkle_proof.verify(proof, tree.root, leaf))
+
+    erc1155 = ERC1155Mock.deploy(True)
+    to = default_chain.accounts[1]
+    txs = _per_second(TXS, lambda i: erc1155.mint(to, i, 1, b""))
+
+    start = time.perf_counter()
+    run_seeded(ERC1155FuzzTest, 1, FUZZ_FLOWS, seed=0)
+    flows = FUZZ_FLOWS / (time.perf_counter() - start)
+    return calls, txs, flows
+
+
+def test_chain_transport():
+    results = {}
+    with default_chain.connect(accounts=20):
+        results["websocket"] = _measure()
+    with connect_ipc(accounts=20):
+        results["ipc"] = _measure()
+
+    base = results["websocket"]
+    rows = [
+        (name, *(f"{v:.0f}" for v in values), f"{values[0] / base[0]:.2f}x")
+        for name, values in results.items()
+    ]
+    print()
+    print(format_table(("transport", "calls/s", "txs/s", "fuzz flows/s", "calls speedup"), rows))
@@ -0,0 +1,44 @@
+import time
+
+from wake.testing import *
+
+from .test_eip712_fuzz import Eip712FuzzTest
+from .test_erc1155_fuzz import ERC1155FuzzTest
+from .test_erc721_fuzz import ERC721FuzzTest
+from .test_signature_checker_fuzz import SignatureCheckerFuzzTest
+from .utils import format_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_fuzz_setup.py -s`.
+
+SEQUENCES = 50
+
+
+def _setup_time(test, redeploy: bool) -> float:
+    # Per-sequence setup as the runner does it: snapshot, pre_sequence, revert.
+    test.redeploy = redeploy
+    start = time.perf_counter()
+    for _ in range(SEQUENCES):
+        snapshot = default_chain.snapshot()
+        test.pre_sequence()
+        default_chain.revert(snapshot)
+    return (time.perf_counter() - start) / SEQUENCES
+
+
+@default_chain.connect(accounts=20)
+def test_fuzz_setup():
+    rows = []
+    for test_class in (ERC1155FuzzTest, ERC721FuzzTest, SignatureCheckerFuzzTest, Eip712FuzzTest):
+        with test_class() as test:
+            test.setup_fixtures()
+            redeploy = _setup_time(test, True)
+            revert = _setup_time(test, False)
+        rows.append((
+            test_class.__name__,
+            f"{redeploy * 1000:.2f}",
+            f"{revert * 1000:.2f}",
+            f"{(redeploy - revert) * 1000:.2f}",
+            f"{redeploy / revert:.1f}x",
+        ))
+
+    print()
+    print(format_table(("test", "redeploy ms/seq", "snapshot ms/seq", "saved ms/seq", "speedup"), rows))
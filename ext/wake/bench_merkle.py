@@ -0,0 +1,43 @@
+import time
+from typing import List
+
+from wake.testing import keccak256
+
+from .utils import format_table, hash_leaves, hash_level
+
+# Not collected by default, run explicitly with `wake test tests/bench_merkle.py -s`.
+
+SIZES = [1 << 10, 1 << 14, 1 << 17, 1 << 20]
+
+
+def _hash_level_per_node(level: List[bytes]) -> List[bytes]:
+    # the per-node path MerkleTree used before levels were hashed as contiguous buffers
+    if len(level) % 2 == 1:
+        level.append(level[-1])
+    return [
+        keccak256(level[i] + level[i + 1]) if level[i] < level[i + 1]
+        else keccak256(level[i + 1] + level[i])
+        for i in range(0, len(level), 2)
+    ]
+
+
+def _nodes_per_second(size: int, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return size / (time.perf_counter() - start)
+
+
+def test_hash_level_throughput():
+    rows = []
+    for size in SIZES:
+        nodes = hash_leaves([i.to_bytes(32, "big") for i in range(size)])
+        level = [nodes[offset:offset + 32] for offset in range(0, len(nodes), 32)]
+        assert b"".join(_hash_level_per_node(list(level))) == hash_level(nodes, processes=1) == hash_level(nodes)
+
+        per_node = _nodes_per_second(size, lambda: _hash_level_per_node(list(level)))
+        batched = _nodes_per_second(size, lambda: hash_level(nodes, processes=1))
+        pooled = _nodes_per_second(size, lambda: hash_level(nodes))
+        rows.append((size, f"{per_node:,.0f}", f"{batched:,.0f}", f"{pooled:,.0f}"))
+
+    print()
+    print(format_table(["nodes", "per-node (nodes/s)", "batched (nodes/s)", "batched + pool (nodes/s)"], rows))
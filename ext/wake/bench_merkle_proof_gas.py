@@ -0,0 +1,65 @@
+import random
+
+from wake.testing import *
+from pytypes.tests.MerkleProofMock import MerkleProofMock
+
+from .utils import MerkleTree, format_table, write_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_merkle_proof_gas.py -s`.
+# Leaves and selections are deterministic, so the CSV files can be diffed across releases.
+
+TREE_SIZES = [2 ** i for i in range(1, 21)]
+MULTIPROOF_DENSITIES = [0.001, 0.01, 0.1, 0.5, 1.0]
+# keeps the largest multiproofs within the block gas limit
+MAX_MULTIPROOF_LEAVES = 256
+PROOF_SAMPLES = 3
+
+
+@default_chain.connect()
+def test_merkle_proof_gas():
+    default_chain.set_default_accounts(default_chain.accounts[0])
+    merkle_proof_mock = MerkleProofMock.deploy()
+
+    proof_rows = []
+    multiproof_rows = []
+    for size in TREE_SIZES:
+        rng = random.Random(size)
+        tree = MerkleTree()
+        for i in range(size):
+            tree.add_leaf(i.to_bytes(32, "big"))
+        leaf_hashes = [keccak256(leaf) for leaf in tree.values]
+
+        verify_gas = []
+        verify_calldata_gas = []
+        for index in rng.sample(range(size), min(size, PROOF_SAMPLES)):
+            proof = tree.get_proof(index)
+            tx = merkle_proof_mock.verify(proof, tree.root, leaf_hashes[index], request_type="tx")
+            assert tx.return_value
+            verify_gas.append(tx.gas_used)
+            tx = merkle_proof_mock.verifyCalldata(proof, tree.root, leaf_hashes[index], request_type="tx")
+            assert tx.return_value
+            verify_calldata_gas.append(tx.gas_used)
+        proof_rows.append((size, len(proof), sum(verify_gas) // len(verify_gas), sum(verify_calldata_gas) // len(verify_calldata_gas)))
+
+        for density in MULTIPROOF_DENSITIES:
+            count = min(max(1, round(size * density)), MAX_MULTIPROOF_LEAVES)
+            indexes = sorted(rng.sample(range(size), count))
+            proof, flags = tree.get_multiproof(indexes)
+            leaves = [leaf_hashes[i] for i in indexes]
+
+            tx = merkle_proof_mock.verifyMultiProof(proof, tree.root, leaves, flags, request_type="tx")
+            assert tx.return_value
+            multiproof_gas = tx.gas_used
+            tx = merkle_proof_mock.verifyMultiProofCalldata(proof, tree.root, leaves, flags, request_type="tx")
+            assert tx.return_value
+            multiproof_rows.append((size, density, count, len(proof), multiproof_gas, tx.gas_used))
+
+    proof_header = ["leaves", "proof length", "verify", "verifyCalldata"]
+    multiproof_header = ["leaves", "density", "selected", "proof length", "verifyMultiProof", "verifyMultiProofCalldata"]
+    write_table("merkle_proof_gas.csv", proof_header, proof_rows)
+    write_table("merkle_multiproof_gas.csv", multiproof_header, multiproof_rows)
+
+    print()
+    print(format_table(proof_header, proof_rows))
+    print()
+    print(format_table(multiproof_header, multiproof_rows))
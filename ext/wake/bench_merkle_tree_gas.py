@@ -0,0 +1,32 @@
+from wake.testing import *
+from pytypes.tests.MerkleTreeLibMock import MerkleTreeLibMock
+
+from .utils import CompleteMerkleTree, format_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_merkle_tree_gas.py -s`.
+
+LEAF_COUNTS = [1, 2, 3, 4, 7, 8, 16, 31, 32, 64, 100, 128, 256, 512, 1000, 1024, 2048, 4096]
+
+
+@default_chain.connect()
+def test_merkle_tree_gas():
+    merkle_tree = MerkleTreeLibMock.deploy()
+
+    rows = []
+    for count in LEAF_COUNTS:
+        leaves = [keccak256(i.to_bytes(32, "big")) for i in range(count)]
+        tree = CompleteMerkleTree.build(leaves)
+
+        root, build_gas = merkle_tree.buildGas(leaves)
+        assert root == tree.root
+
+        proof_gas = []
+        for index in {0, count // 2, count - 1}:
+            proof, gas_used = merkle_tree.leafProofGas(tree.nodes, index)
+            assert proof == tree.leaf_proof(index)
+            proof_gas.append(gas_used)
+
+        rows.append((count, build_gas, build_gas // count, max(proof_gas), build_gas // max(proof_gas)))
+
+    print()
+    print(format_table(["leaves", "build gas", "build gas / leaf", "leafProof gas", "build / leafProof"], rows))
@@ -0,0 +1,79 @@
+import random
+import statistics
+
+from wake.testing import *
+from pytypes.tests.SignatureCheckerMock import ERC1271SignatureChecker, SignatureCheckerMock
+
+from .signature_pool import SignedHash, sign_hash
+from .utils import format_table, write_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_signature_checker_gas.py -s`.
+# Transaction gas of every SignatureCheckerMock entry point, for an EOA signer and for
+# ERC1271SignatureChecker, valid and invalid. The execution columns subtract the 21000 base cost
+# and the calldata cost, which is what differs most between the signature forms. Keys and messages
+# are deterministic, so the CSV file can be diffed across releases. The isValidERC1271SignatureNow
+# rows for the EOA have no valid case, they measure the early return on a signer without code.
+
+SAMPLES = 5
+PRIVATE_KEY = bytes(keccak256(b"bench_signature_checker_gas"))
+
+# (entry point, signature form, pytypes method name)
+ENTRY_POINTS = [
+    (family, form, family + suffix)
+    for family in ("isValidSignatureNow", "isValidERC1271SignatureNow")
+    for form, suffix in (("bytes", ""), ("bytes calldata", "Calldata"), ("r, vs", "_"), ("v, r, s", "__"))
+]
+
+
+def _arguments(form: str, signed: SignedHash) -> tuple:
+    if form in ("bytes", "bytes calldata"):
+        return (signed.signature,)
+    if form == "r, vs":
+        return signed.r, signed.vs
+    return signed.v, signed.r, signed.s
+
+
+def _intrinsic_gas(data: bytes) -> int:
+    return 21000 + sum(4 if b == 0 else 16 for b in data)
+
+
+@default_chain.connect()
+def test_signature_checker_gas():
+    default_chain.set_default_accounts(default_chain.accounts[0])
+    mock = SignatureCheckerMock.deploy()
+    erc1271 = ERC1271SignatureChecker.deploy()
+    # ERC1271SignatureChecker accepts signatures by tx.origin, so transactions are sent by the EOA
+    eoa = Account.from_key(PRIVATE_KEY)
+    eoa.balance = 10**20
+
+    rng = random.Random(0)
+    messages = []
+    for _ in range(SAMPLES):
+        signed = sign_hash(PRIVATE_KEY, rng.randbytes(32))
+        # a well-formed signature of another hash, recovering a different address
+        messages.append((signed, signed.hash[:31] + bytes([signed.hash[31] ^ 1])))
+
+    rows = []
+    for family, form, name in ENTRY_POINTS:
+        for signer_type, signer in (("EOA", eoa), ("ERC1271", erc1271)):
+            gas = {True: [], False: []}
+            execution = {True: [], False: []}
+            for signed, wrong_hash in messages:
+                for valid, hash in ((True, signed.hash), (False, wrong_hash)):
+                    tx = getattr(mock, name)(signer, hash, *_arguments(form, signed), from_=eoa, request_type="tx")
+                    # the ERC-1271 family never accepts an EOA
+                    assert tx.return_value == (valid and not (family == "isValidERC1271SignatureNow" and signer_type == "EOA"))
+                    gas[valid].append(tx.gas_used)
+                    execution[valid].append(tx.gas_used - _intrinsic_gas(tx.data))
+            rows.append((
+                family,
+                form,
+                signer_type,
+                *(statistics.median_low(samples[valid]) for samples in (gas, execution) for valid in (True, False)),
+            ))
+
+    header = ["entry point", "signature", "signer", "valid gas", "invalid gas", "valid execution", "invalid execution"]
+    write_table("signature_checker_gas.csv", header, rows)
+
+    print()
+    print(format_table(header, rows))
@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from .utils import format_table
+
+# Not collected by default, run explicitly with `wake test tests/bench_startup.py -s`.
+# Imports every test module in a fresh interpreter and times the import itself, which is what
+# collecting it costs, and loading the pytypes bindings it references, which is deferred to
+# their first use by LazyContract and was paid at import before.
+
+RUNS = 5
+PACKAGE = __name__.rpartition(".")[0]
+
+_SCRIPT = """
+import importlib, sys, time
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+from {package}.utils import LazyContract
+lazy = [v for v in vars(module).values() if isinstance(v, LazyContract)]
+for contract in lazy:
+    contract.load()
+print(imported - start, time.perf_counter() - imported, len(lazy))
+"""
+
+
+def _time_import(module: str) -> tuple:
+    samples = []
+    for _ in range(RUNS):
+        out = subprocess.run(
+            [sys.executable, "-c", _SCRIPT.format(package=PACKAGE), module],
+            capture_output=True,
+            check=True,
+            cwd=os.getcwd(),
+            text=True,
+        ).stdout.split()
+        samples.append((float(out[0]), float(out[1]), int(out[2])))
+    return (
+        statistics.median(s[0] for s in samples),
+        statistics.median(s[1] for s in samples),
+        samples[0][2],
+    )
+
+
+def test_startup():
+    directory = os.path.dirname(__file__)
+    rows = []
+    for file in sorted(os.listdir(directory)):
+        if not (file.startswith("test_") and file.endswith(".py")):
+            continue
+        module = f"{PACKAGE}.{file[:-3]}"
+        imported, bindings, count = _time_import(module)
+        rows.append((
+            file[:-3],
+            count,
+            f"{imported * 1000:.0f}",
+            f"{bindings * 1000:.0f}",
+            f"{(imported + bindings) * 1000:.0f}",
+        ))
+
+    print()
+    print(format_table(("module", "bindings", "lazy import ms", "deferred load ms", "eager import ms"), rows))
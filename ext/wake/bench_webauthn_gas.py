@@ -0,0 +1,74 @@
+import random
+import statistics
+
+from wake.testing import *
+
+from . import p256_reference as p256
+from . import webauthn
+from .utils import LazyContract, format_table, use_path, verifier_bytecode, write_table
+
+WebAuthnMock = LazyContract("pytypes.tests.WebAuthnMock", "WebAuthnMock")
+WebAuthn = LazyContract("pytypes.src.utils.WebAuthn", "WebAuthn")
+
+# Not collected by default, run explicitly with `wake test tests/bench_webauthn_gas.py -s`.
+# Transaction gas of WebAuthn.verify with the auth passed as a struct, abi.encode'd and compact
+# encoded (decoded from memory and from calldata), so it includes what each costs in calldata.
+# Assertions are deterministic, so the CSV file can be diffed across releases.
+
+# (name, challenge bytes, authenticator data extension bytes)
+SHAPES = [
+    ("minimal", 0, 0),
+    ("typical", 32, 0),
+    ("extensions", 32, 256),
+    ("long challenge", 512, 0),
+]
+SAMPLES = 5
+
+
+@default_chain.connect()
+def test_webauthn_gas():
+    default_chain.set_default_accounts(default_chain.accounts[0])
+    mock = WebAuthnMock.deploy()
+    native_precompile = mock.hasPrecompile()
+    bytecode = verifier_bytecode()
+    paths = ["precompile"] if native_precompile else ["precompile", "verifier"]
+
+    rng = random.Random(0)
+    private_key = rng.randint(1, p256.N - 1)
+    x, y = (c.to_bytes(32, "big") for c in p256.public_key(private_key))
+
+    rows = []
+    for path in paths:
+        use_path(path, native_precompile, bytecode)
+        for name, challenge_length, extension_length in SHAPES:
+            gas = {}
+            for _ in range(SAMPLES):
+                challenge = rng.randbytes(challenge_length)
+                flags = webauthn.FLAG_UP | webauthn.FLAG_UV | (webauthn.FLAG_ED if extension_length else 0)
+                data = webauthn.authenticator_data("example.com", flags, 0, rng.randbytes(extension_length))
+                json, challenge_index, type_index = webauthn.client_data_json(challenge, "https://example.com")
+                auth = webauthn.sign(private_key, webauthn.WebAuthnAuth(data, json, challenge_index, type_index, b"", b""), rng)
+                struct = WebAuthn.WebAuthnAuth(bytearray(data), json, challenge_index, type_index, auth.r, auth.s)
+                compact = webauthn.encode_compact(auth)
+
+                for entry, send in (
+                    ("verify", lambda: mock.verify(challenge, True, struct, x, y, request_type="tx")),
+                    ("verifyEncoded", lambda: mock.verifyEncoded(challenge, True, mock.encodeAuth(struct), x, y, request_type="tx")),
+                    ("verifyCompact", lambda: mock.verifyCompact(challenge, True, compact, x, y, request_type="tx")),
+                    ("verifyCompactCalldata", lambda: mock.verifyCompactCalldata(challenge, True, compact, x, y, request_type="tx")),
+                ):
+                    tx = send()
+                    assert tx.return_value, f"{path}, {name}: {entry}"
+                    gas.setdefault(entry, []).append((len(tx.data), tx.gas_used))
+
+            baseline = statistics.median_low(g for _, g in gas["verify"])
+            for entry, samples in gas.items():
+                median = statistics.median_low(g for _, g in samples)
+                calldata = statistics.median_low(c for c, _ in samples)
+                rows.append((path, name, entry, calldata, median, median - baseline))
+
+    header = ["path", "shape", "entry point", "calldata bytes", "gas", "vs verify"]
+    write_table("webauthn_gas.csv", header, rows)
+
+    print()
+    print(format_table(header, rows))
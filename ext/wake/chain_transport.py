@@ -0,0 +1,104 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from wake.development.globals import get_config
+from wake.testing import Chain, default_chain
+from wake.utils.networking import get_free_port
+
+# IPC transport for the chain the tests run on: the same external anvil, reached over a unix socket
+# instead of the websocket wake launches by default. Requests are still JSON-RPC and the EVM still
+# runs in the anvil process, this only trims the websocket framing and TCP stack per call.
+# This is not an in-process EVM backend and does not remove the JSON-RPC round trip. wake drives
+# nodes over JSON-RPC only, and an embedded EVM with the same chain semantics is not implemented here.
+#
+# Set WAKE_CHAIN_IPC=1 to have the fuzz runners connect over IPC.
+USE_IPC = os.environ.get("WAKE_CHAIN_IPC", "") == "1"
+
+
+def _anvil_args(
+    ipc_path: Optional[str],
+    port: int,
+    accounts: Optional[int],
+    chain_id: Optional[int],
+    fork: Optional[str],
+    hardfork: Optional[str],
+) -> List[str]:
+    args = ["anvil"] + get_config().testing.anvil.cmd_args.split()
+    # anvil always binds a port, also next to a unix socket, keep it from colliding with other instances
+    args += ["--port", str(port)]
+    if ipc_path is not None:
+        args += ["--ipc", ipc_path]
+    if accounts is not None:
+        args += ["-a", str(accounts)]
+    if chain_id is not None:
+        args += ["--chain-id", str(chain_id)]
+    if fork is not None:
+        args += ["-f", fork]
+    if hardfork is not None:
+        args += ["--hardfork", hardfork]
+    return args
+
+
+def _listening(port: int) -> bool:
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def launch_anvil(
+    *,
+    ipc: bool = USE_IPC,
+    accounts: Optional[int] = None,
+    chain_id: Optional[int] = None,
+    fork: Optional[str] = None,
+    hardfork: Optional[str] = None,
+    timeout: float = 10.0,
+) -> Iterator[str]:
+    # Launches anvil with the wake.toml arguments and yields its uri, a fresh unix socket with `ipc`,
+    # ws://127.0.0.1:<port> otherwise. The process belongs to the caller and is terminated on exit.
+    directory = tempfile.mkdtemp(prefix="wake-anvil-")
+    ipc_path = os.path.join(directory, "anvil.ipc") if ipc else None
+    port = get_free_port()
+    process = subprocess.Popen(
+        _anvil_args(ipc_path, port, accounts, chain_id, fork, hardfork),
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while not (os.path.exists(ipc_path) if ipc_path is not None else _listening(port)):
+            if process.poll() is not None:
+                raise RuntimeError(f"anvil exited with code {process.returncode}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"anvil did not start listening in {timeout}s")
+            time.sleep(0.01)
+        yield ipc_path if ipc_path is not None else f"ws://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def connect_owned(chain: Chain = default_chain, **launch_kwargs) -> Iterator[Chain]:
+    # Counterpart of chain.connect(accounts=...) on an anvil of the caller's own. The chain is
+    # connected by uri, so none of the idle chains wake keeps for reuse (in a forked worker, the
+    # parent's) is ever picked. It disconnects (and reverts its snapshot) before anvil is terminated.
+    with launch_anvil(**launch_kwargs) as uri, chain.connect(uri=uri):
+        yield chain
+
+
+def connect_ipc(chain: Chain = default_chain, **launch_kwargs):
+    # connect_owned() over a unix socket, usable as a decorator as well
+    return connect_owned(chain, ipc=True, **launch_kwargs)
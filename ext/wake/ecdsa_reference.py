@@ -0,0 +1,122 @@
+from typing import List, Optional, Sequence, Tuple
+
+from Crypto.Hash import keccak
+from eth_keys import keys
+
+from .utils import _map_chunks
+
+# Python port of src/utils/ECDSA.sol (and the EOA branch of SignatureCheckerLib) to check
+# malleated and edge-case signatures offline. Like the ecrecover precompile and the library,
+# recovery accepts high `s` values, only canonical_hash() folds them onto the low-s form.
+
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+HALF_N_PLUS_1 = 0x7FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF5D576E7357A4501DDFE92F46681B20A1
+ZERO_ADDRESS = bytes(20)
+# `InvalidSignature()`, raised by the recover variants
+INVALID_SIGNATURE = bytes.fromhex("8baa579f")
+
+# batches below this size are recovered in-process, a recovery costs about a millisecond
+PARALLEL_THRESHOLD = 512
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+def _keccak(data: bytes) -> bytes:
+    return keccak.new(data=data, digest_bits=256).digest()
+
+
+def ecrecover(hash: bytes, v: int, r: int, s: int) -> Optional[bytes]:
+    # The ecrecover precompile: None where it returns no data.
+    if v not in (27, 28) or not 0 < r < N or not 0 < s < N:
+        return None
+    try:
+        signature = keys.Signature(vrs=(v - 27, r, s))
+        return signature.recover_public_key_from_msg_hash(hash).to_canonical_address()
+    except Exception:
+        # r is not the x coordinate of a curve point
+        return None
+
+
+def split_signature(signature: bytes) -> Optional[Tuple[int, int, int]]:
+    # (v, r, s) of a 65-byte (r, s, v) or 64-byte EIP-2098 (r, vs) signature, None for other lengths.
+    if len(signature) == 64:
+        return split_vs(signature[:32], signature[32:])
+    if len(signature) == 65:
+        return signature[64], int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:64], "big")
+    return None
+
+
+def split_vs(r: bytes, vs: bytes) -> Tuple[int, int, int]:
+    vs_int = int.from_bytes(vs, "big")
+    return (vs_int >> 255) + 27, int.from_bytes(r, "big"), vs_int & ((1 << 255) - 1)
+
+
+def try_recover(hash: bytes, signature: bytes) -> bytes:
+    vrs = split_signature(signature)
+    if vrs is None:
+        return ZERO_ADDRESS
+    return ecrecover(hash, *vrs) or ZERO_ADDRESS
+
+
+def try_recover_vs(hash: bytes, r: bytes, vs: bytes) -> bytes:
+    return ecrecover(hash, *split_vs(r, vs)) or ZERO_ADDRESS
+
+
+def try_recover_vrs(hash: bytes, v: int, r: bytes, s: bytes) -> bytes:
+    return ecrecover(hash, v & 0xFF, int.from_bytes(r, "big"), int.from_bytes(s, "big")) or ZERO_ADDRESS
+
+
+def recover(hash: bytes, signature: bytes) -> bytes:
+    ret = try_recover(hash, signature)
+    if ret == ZERO_ADDRESS:
+        raise InvalidSignature()
+    return ret
+
+
+def is_valid_signature_now(signer: bytes, hash: bytes, signature: bytes) -> bool:
+    # SignatureCheckerLib.isValidSignatureNow for a signer without code.
+    return signer != ZERO_ADDRESS and try_recover(hash, signature) == signer
+
+
+def canonical_hash(signature: bytes) -> bytes:
+    if len(signature) not in (64, 65):
+        # uniquely corrupt hash, xored with bytes4(keccak256("InvalidSignatureLength"))
+        return (int.from_bytes(_keccak(signature), "big") ^ 0xD62F1AB2).to_bytes(32, "big")
+    v, r, s = split_signature(signature)
+    return canonical_hash_vrs(v, signature[:32], s.to_bytes(32, "big"))
+
+
+def canonical_hash_vs(r: bytes, vs: bytes) -> bytes:
+    # unlike the other forms, s is hashed as is even when high
+    v, _, s = split_vs(r, vs)
+    return _keccak(r + s.to_bytes(32, "big") + bytes([v]))
+
+
+def canonical_hash_vrs(v: int, r: bytes, s: bytes) -> bytes:
+    s_int = int.from_bytes(s, "big")
+    if s_int >= HALF_N_PLUS_1:
+        # flips 27 <-> 28, any other v stays uniquely corrupt
+        v ^= 7
+        # wraps like sub(N, s) for s >= N
+        s_int = (N - s_int) % 2**256
+    return _keccak(r + s_int.to_bytes(32, "big") + bytes([v & 0xFF]))
+
+
+def try_recover_batch(items: Sequence[Tuple[bytes, bytes]], processes: Optional[int] = None) -> List[bytes]:
+    # try_recover() of every (hash, signature) pair, large batches are split over a process pool
+    return _map_chunks(_try_recover_chunk, items, processes, PARALLEL_THRESHOLD)
+
+
+def is_valid_signature_batch(items: Sequence[Tuple[bytes, bytes, bytes]], processes: Optional[int] = None) -> List[bool]:
+    # is_valid_signature_now() of every (signer, hash, signature)
+    return _map_chunks(_is_valid_signature_chunk, items, processes, PARALLEL_THRESHOLD)
+
+
+def _try_recover_chunk(items: Sequence[Tuple[bytes, bytes]]) -> List[bytes]:
+    return [try_recover(*item) for item in items]
+
+
+def _is_valid_signature_chunk(items: Sequence[Tuple[bytes, bytes, bytes]]) -> List[bool]:
+    return [is_valid_signature_now(*item) for item in items]
@@ -0,0 +1,193 @@
+import dataclasses
+import math
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Type, get_args, get_origin, get_type_hints
+
+from Crypto.Hash import keccak
+from wake.development.core import Account, Address, Eip712Domain
+from wake.development.primitive_types import FixedSizeBytes, Integer
+
+# EIP-712 hashing of wake dataclasses, the same digests as Account.sign_structured. Each dataclass
+# is compiled once into its typeHash and a list of field encoders, and a DomainCache reads domain
+# separators from the contract's eip712Domain() once per (contract, chainId), so hashing a message
+# costs neither schema work nor RPC.
+
+Encoder = Callable[[Any], bytes]
+
+
+def _keccak(data: bytes) -> bytes:
+    return keccak.new(data=data, digest_bits=256).digest()
+
+
+# solady's EIP712 reports fields 0x0f: name, version, chainId and verifyingContract
+DOMAIN_TYPEHASH = _keccak(b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+
+
+def _struct_name(t: Type) -> str:
+    return getattr(t, "original_name", t.__name__)
+
+
+def _list_element(t: Type):
+    # (element type, "[]" or "[n]") of a list annotation, None otherwise
+    origin = get_origin(t)
+    if isinstance(origin, type) and issubclass(origin, list):
+        return get_args(t)[0], f"[{origin.length}]" if hasattr(origin, "length") else "[]"
+    return None
+
+
+def _type_name(t: Type) -> str:
+    # same mapping as Account._prepare_eip712_dict
+    element = _list_element(t)
+    if element is not None:
+        return _type_name(element[0]) + element[1]
+    if isinstance(t, type) and issubclass(t, Integer):
+        if t.min == 0:
+            return f"uint{math.ceil(math.log2(t.max + 1))}"
+        return f"int{math.ceil(math.log2(t.max - t.min + 1))}"
+    if isinstance(t, type) and issubclass(t, FixedSizeBytes):
+        return f"bytes{t.length}"
+    if t is int:
+        return "int256"
+    if t is bytes or t is bytearray:
+        return "bytes"
+    if t is str:
+        return "string"
+    if t is bool:
+        return "bool"
+    if isinstance(t, type) and issubclass(t, Enum):
+        return "uint8"
+    if isinstance(t, type) and issubclass(t, (Account, Address)):
+        return "address"
+    if dataclasses.is_dataclass(t):
+        return _struct_name(t)
+    raise ValueError(f"Unsupported type {t}")
+
+
+def _encode_address(value) -> bytes:
+    if isinstance(value, Account):
+        value = value.address
+    elif not isinstance(value, Address):
+        value = Address(value)
+    return bytes(12) + bytes(value)
+
+
+def _encode_int(value) -> bytes:
+    return (int(value) % 2**256).to_bytes(32, "big")
+
+
+def _encoder(t: Type) -> Encoder:
+    # encodeData of one member: atomic values padded to a word, dynamic values and arrays hashed
+    element = _list_element(t)
+    if element is not None:
+        encode = _encoder(element[0])
+        return lambda value: _keccak(b"".join(encode(v) for v in value))
+    name = _type_name(t)
+    if dataclasses.is_dataclass(t):
+        return lambda value: compile_struct(t).hash(value)
+    if name == "string":
+        return lambda value: _keccak(value.encode())
+    if name == "bytes":
+        return lambda value: _keccak(bytes(value))
+    if name == "address":
+        return _encode_address
+    if name == "bool":
+        return lambda value: bytes(31) + bytes([bool(value)])
+    if name.startswith("bytes"):
+        return lambda value: bytes(value).ljust(32, b"\x00")
+    return _encode_int
+
+
+def _referenced(t: Type, found: Dict[str, Type]) -> None:
+    # every struct type reachable from t's members, by name
+    hints = get_type_hints(t, include_extras=True)
+    for f in dataclasses.fields(t):
+        member = hints[f.name]
+        while _list_element(member) is not None:
+            member = _list_element(member)[0]
+        if dataclasses.is_dataclass(member) and _struct_name(member) not in found:
+            found[_struct_name(member)] = member
+            _referenced(member, found)
+
+
+def _members(t: Type) -> str:
+    hints = get_type_hints(t, include_extras=True)
+    return ",".join(f"{_type_name(hints[f.name])} {f.metadata.get('original_name', f.name)}" for f in dataclasses.fields(t))
+
+
+@dataclasses.dataclass(frozen=True)
+class CompiledStruct:
+    name: str
+    encode_type: str
+    type_hash: bytes
+    # (attribute, encoder) per member, in declaration order
+    fields: Tuple[Tuple[str, Encoder], ...]
+
+    def hash(self, value) -> bytes:
+        return _keccak(self.type_hash + b"".join(encode(getattr(value, name)) for name, encode in self.fields))
+
+
+@lru_cache(maxsize=None)
+def compile_struct(t: Type) -> CompiledStruct:
+    found: Dict[str, Type] = {}
+    _referenced(t, found)
+    found.pop(_struct_name(t), None)
+    encode_type = f"{_struct_name(t)}({_members(t)})" + "".join(
+        f"{name}({_members(found[name])})" for name in sorted(found)
+    )
+    hints = get_type_hints(t, include_extras=True)
+    return CompiledStruct(
+        _struct_name(t),
+        encode_type,
+        _keccak(encode_type.encode()),
+        tuple((f.name, _encoder(hints[f.name])) for f in dataclasses.fields(t)),
+    )
+
+
+def hash_struct(value) -> bytes:
+    return compile_struct(type(value)).hash(value)
+
+
+def hash_structs(values: Sequence) -> List[bytes]:
+    return [hash_struct(value) for value in values]
+
+
+def read_domain(contract) -> Tuple[Eip712Domain, bytes]:
+    # the contract's ERC-5267 eip712Domain(), as accepted by Account.sign_structured, and its separator
+    fields, name, version, chain_id, verifying_contract, _, _ = contract.eip712Domain()
+    assert fields == b"\x0f", f"unsupported eip712Domain() fields {fields.hex()}"
+    domain = Eip712Domain(name=name, version=version, chainId=chain_id, verifyingContract=verifying_contract)
+    separator = _keccak(
+        DOMAIN_TYPEHASH
+        + _keccak(name.encode())
+        + _keccak(version.encode())
+        + _encode_int(chain_id)
+        + _encode_address(verifying_contract)
+    )
+    return domain, separator
+
+
+class DomainCache:
+    # Domains read once per (contract, chainId). Owned by whoever deploys the contracts, e.g. a fuzz test
+    # instance: anvil always runs chain 31337 with deterministic deploy addresses, so a cache outliving the
+    # deployments would hand a later contract at the same address a stale separator.
+    _domains: Dict[Tuple[Address, int], Tuple[Eip712Domain, bytes]]
+
+    def __init__(self):
+        self._domains = {}
+
+    def _get(self, contract) -> Tuple[Eip712Domain, bytes]:
+        key = (contract.address, contract.chain.chain_id)
+        if key not in self._domains:
+            self._domains[key] = read_domain(contract)
+        return self._domains[key]
+
+    def domain(self, contract) -> Eip712Domain:
+        return self._get(contract)[0]
+
+    def domain_separator(self, contract) -> bytes:
+        return self._get(contract)[1]
+
+    def hash_typed_data(self, contract, value) -> bytes:
+        # EIP712._hashTypedData(hashStruct(value)) of contract
+        return _keccak(b"\x19\x01" + self.domain_separator(contract) + hash_struct(value))
@@ -0,0 +1,60 @@
+import importlib
+import json
+import os
+import pickle
+
+from .fuzz_runner import Replayer
+
+# Not collected by default. Replays one sequence logged by run_seeded() or run_sharded()
+# and shrinks it to a minimal list of flows that still fails the same way:
+#
+#   FUZZ_REPLAY_LOG=.wake/logs/fuzz/<log>.jsonl [FUZZ_REPLAY_SEQUENCE=<n>] wake test tests/fuzz_replay.py -s
+#
+# Without FUZZ_REPLAY_SEQUENCE the first failed sequence of the log is replayed. FUZZ_SHRINK=0 skips
+# shrinking, FUZZ_REPLAY_STEPS=<file> re-runs steps saved by an earlier shrink. Shrink attempts run
+# on FUZZ_PROCESSES workers (default cpu_count()), each on its own anvil.
+
+
+def _load_entry(path: str, sequence) -> dict:
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if (sequence is None and entry["error"] is not None) or entry["sequence"] == sequence:
+                return entry
+    raise ValueError(f"No {'failed' if sequence is None else sequence} sequence in {path}")
+
+
+def test_replay():
+    path = os.environ["FUZZ_REPLAY_LOG"]
+    sequence = os.environ.get("FUZZ_REPLAY_SEQUENCE")
+    entry = _load_entry(path, None if sequence is None else int(sequence))
+
+    module_name, qualname = entry["test"].split(":")
+    test_class = getattr(importlib.import_module(module_name), qualname)
+    processes = int(os.environ.get("FUZZ_PROCESSES", 0)) or os.cpu_count() or 1
+
+    with Replayer(test_class, entry["campaign_seed"], entry["sequence"], processes, {"accounts": entry["accounts"]}) as replayer:
+        steps_path = os.environ.get("FUZZ_REPLAY_STEPS")
+        if steps_path:
+            with open(steps_path, "rb") as f:
+                steps = pickle.load(f)
+            signature, error = replayer.replay_steps(steps)
+        else:
+            signature, error, steps = replayer.replay(len(entry["flows"]))
+
+        if signature is None:
+            print(f"sequence {entry['sequence']} of {qualname} passed on replay")
+            return
+
+        if os.environ.get("FUZZ_SHRINK", "1") != "0":
+            steps = replayer.shrink(steps, signature)
+            signature, error = replayer.replay_steps(steps)
+            steps_path = f"{path}.{entry['sequence']}.steps"
+            with open(steps_path, "wb") as f:
+                pickle.dump(steps, f)
+            print(f"shrunk to {len(steps)} flows, saved to {steps_path}")
+
+    raise AssertionError(
+        f"{qualname} sequence {entry['sequence']} fails after {len(steps)} flows: "
+        f"{' -> '.join(name for name, _ in steps)}\n{error}"
+    )
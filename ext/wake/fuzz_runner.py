@@ -0,0 +1,596 @@
+import inspect
+import json
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import random as _random
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, DefaultDict, Dict, Hashable, Iterator, List, Optional, Set, Tuple, Union
+
+from typing_extensions import get_type_hints
+
+from wake.development.core import Contract
+from wake.development.globals import add_fuzz_test_stats
+from wake.testing import default_chain, random
+from wake.testing.fuzzing import FuzzTest
+from wake.testing.fuzzing.generators import generate
+
+from . import chain_transport
+from .gas_profile import GasProfile
+from .tracing import LastTransaction, format_call_trace, on_demand_traces
+
+logger = logging.getLogger(__name__)
+
+FlowStats = Dict[str, DefaultDict[Optional[str], int]]
+
+
+_UNHOOKED = object()
+
+
+class FixtureFuzzTest(FuzzTest):
+    # On-chain fixtures are never deployed by the constructor, wake's shrinking builds instances freely.
+    # The runners here call setup_fixtures() once before their first per-sequence snapshot, so the
+    # fixtures survive every revert and pre_sequence only has to reset the Python model. Under wake's
+    # run(), which snapshots before pre_sequence, pre_sequence finds them reverted and deploys them.
+    # FUZZ_REDEPLOY=1 redeploys in every pre_sequence (see bench_fuzz_setup.py for what that costs).
+    redeploy: bool = os.environ.get("FUZZ_REDEPLOY", "") == "1"
+
+    # Adaptive flow weighting: a flow that produces a (flow, revert selector, coverage_state())
+    # combination not seen before in the sequence gets its weight multiplied by up to ADAPTIVE_BOOST,
+    # decaying back to the decorator weight by ADAPTIVE_DECAY per step. The boosted weights live on the
+    # instance and only the runners here pick by them (flow_weight()), the decorator's f.weight is never
+    # written, wake's run() keeps picking by it. Boosts restart in every pre_sequence, so a sequence
+    # picks the same flows from its seed whatever ran before it (and replays do too).
+    # Opt-in with FUZZ_ADAPTIVE=1, static weights otherwise.
+    adaptive: bool = os.environ.get("FUZZ_ADAPTIVE", "") == "1"
+    ADAPTIVE_BOOST = 4.0
+    ADAPTIVE_DECAY = 0.95
+
+    # step at which each (flow, revert, state) combination was first seen, over all sequences
+    first_seen: Dict[Tuple, int]
+    # combinations seen in the running sequence, the ones novelty is judged against
+    _sequence_seen: Set[Tuple]
+    _steps: int
+    _flows: List[Callable]
+    _boosts: Dict[Callable, float]
+    # revert keys of the running flow, None outside of flows
+    _flow_reverts: Optional[List[Union[bytes, str]]]
+    # tx_callback of the chain before this instance hooked it, _UNHOOKED while not hooked
+    _previous_callback: Optional[Callable]
+    # contracts the last deploy_fixtures() stored on the instance, None before the first one
+    _fixtures: Optional[List[Contract]]
+
+    def __init__(self):
+        self.first_seen = {}
+        self._steps = 0
+        self._flows = _get_methods(type(self), "flow")
+        self._flow_reverts = None
+        self._reset_weights()
+        self._previous_callback = _UNHOOKED
+        self._fixtures = None
+
+    def __enter__(self) -> "FixtureFuzzTest":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # Unhooks the chain after a sequence that raised before post_sequence.
+        self._unhook()
+
+    def deploy_fixtures(self) -> None:
+        pass
+
+    def setup_fixtures(self) -> None:
+        if not self._fixtures_deployed():
+            self._deploy_fixtures()
+
+    def flow_weight(self, flow: Callable) -> float:
+        if not self.adaptive:
+            return flow.weight
+        return flow.weight * self._boosts[flow]
+
+    def coverage_state(self) -> Hashable:
+        # coarse abstraction of the Python model, new values count as new coverage
+        return None
+
+    def pre_sequence(self) -> None:
+        if self.redeploy or not self._fixtures_deployed():
+            self._deploy_fixtures()
+        self._reset_weights()
+        self._hook()
+
+    def post_sequence(self) -> None:
+        self._unhook()
+
+    def pre_flow(self, flow: Callable) -> None:
+        self._flow_reverts = []
+        if GasProfile.active is not None:
+            GasProfile.active.flow = flow.__name__
+
+    def post_flow(self, flow: Callable) -> None:
+        if GasProfile.active is not None:
+            GasProfile.active.flow = None
+        self._adapt_weights(flow)
+        self._flow_reverts = None
+
+    def _adapt_weights(self, flow: Callable) -> None:
+        self._steps += 1
+        state = self.coverage_state()
+        novel = False
+        for revert in self._flow_reverts or [None]:
+            key = (flow.__name__, revert, state)
+            self.first_seen.setdefault(key, self._steps)
+            if key not in self._sequence_seen:
+                self._sequence_seen.add(key)
+                novel = True
+
+        for f in self._flows:
+            self._boosts[f] = 1.0 + (self._boosts[f] - 1.0) * self.ADAPTIVE_DECAY
+        if novel:
+            self._boosts[flow] = min(self._boosts[flow] + self.ADAPTIVE_BOOST, 1.0 + self.ADAPTIVE_BOOST)
+
+    def _reset_weights(self) -> None:
+        self._sequence_seen = set()
+        self._boosts = {f: 1.0 for f in self._flows}
+
+    def _hook(self) -> None:
+        # Hooked for the duration of a sequence only, so instances sharing a chain never stack
+        # callbacks. Still hooked if the previous sequence raised, then the hook is kept as is.
+        if self._previous_callback is not _UNHOOKED:
+            return
+        self._previous_callback = default_chain.tx_callback
+        default_chain.tx_callback = self._tx_callback
+
+    def _unhook(self) -> None:
+        if self._previous_callback is _UNHOOKED:
+            return
+        default_chain.tx_callback = self._previous_callback
+        self._previous_callback = _UNHOOKED
+
+    def _tx_callback(self, tx) -> None:
+        if self._previous_callback is not None:
+            self._previous_callback(tx)
+        if tx.error is not None and self._flow_reverts is not None:
+            self._flow_reverts.append(_revert_key(tx.error))
+
+    def _fixtures_deployed(self) -> bool:
+        # a revert to a snapshot taken before the deployment leaves the fixture addresses without code
+        return self._fixtures is not None and all(len(c.code) > 0 for c in self._fixtures)
+
+    def _deploy_fixtures(self) -> None:
+        self.deploy_fixtures()
+        self._fixtures = [v for v in vars(self).values() if isinstance(v, Contract)]
+        if GasProfile.active is not None:
+            GasProfile.active.watch_attributes(self)
+
+
+def _revert_key(error: Exception) -> Union[bytes, str]:
+    # the selector of a raw revert, otherwise the decoded error type
+    data = getattr(error, "data", None)
+    if isinstance(data, (bytes, bytearray)) and len(data) >= 4:
+        return bytes(data[:4])
+    return type(error).__name__
+
+
+@dataclass
+class FuzzFailure:
+    sequence: int
+    seed: int
+    flows: List[str]
+    error: str
+    log: str
+    call_trace: Optional[str] = None
+
+
+@dataclass
+class FuzzReport:
+    test: str
+    seed: int
+    sequences: int
+    flow_stats: FlowStats = field(default_factory=dict)
+    failures: List[FuzzFailure] = field(default_factory=list)
+
+    def merge(self, other: "FuzzReport") -> None:
+        self.sequences += other.sequences
+        for name, stats in other.flow_stats.items():
+            merged = self.flow_stats.setdefault(name, defaultdict(int))
+            for ret, count in stats.items():
+                merged[ret] += count
+        self.failures.extend(other.failures)
+        self.failures.sort(key=lambda f: f.sequence)
+
+
+def _get_methods(test_class: type, attr: str) -> List[Callable]:
+    # Same discovery as wake: plain functions on the class carrying the decorator attribute.
+    ret = []
+    for name in dir(test_class):
+        m = getattr(test_class, name)
+        if getattr(m, attr, False):
+            ret.append(m)
+    return ret
+
+
+def sequence_seed(seed: int, sequence: int) -> int:
+    # Seeds depend only on the campaign seed and the global sequence number,
+    # so a failing sequence replays the same way whatever the shard count was.
+    return (seed * 0x9E3779B97F4A7C15 + sequence) & ((1 << 64) - 1)
+
+
+def seed_sequence(seed: int) -> None:
+    # Tests draw from both wake's generator and the stdlib module one.
+    random.seed(seed)
+    _random.seed(seed)
+
+
+# Generator states a flow starts from, enough to re-run it with the same parameters.
+RandomState = Tuple[tuple, tuple]
+Step = Tuple[str, RandomState]
+
+LOG_DIR = os.path.join(".wake", "logs", "fuzz")
+
+
+def _get_random_state() -> RandomState:
+    return random.getstate(), _random.getstate()
+
+
+def _set_random_state(state: RandomState) -> None:
+    random.setstate(state[0])
+    _random.setstate(state[1])
+
+
+def run_sequence(
+    test_instance: FuzzTest,
+    sequence: int,
+    flows_count: int,
+    flow_stats: FlowStats,
+    trace: List[str],
+    states: Optional[List[RandomState]] = None,
+    replay: Optional[List[Step]] = None,
+) -> None:
+    # The body of wake's single_fuzz_test for one sequence, minus the chain snapshots.
+    # `states` collects the generator state every flow starts from, `replay` runs a
+    # recorded list of steps (e.g. a subset of one) instead of picking flows at random.
+    flows = _get_methods(type(test_instance), "flow")
+    flows_by_name = {f.__name__: f for f in flows}
+    invariants = _get_methods(type(test_instance), "invariant")
+    flows_counter: DefaultDict[Callable, int] = defaultdict(int)
+    invariant_periods: DefaultDict[Callable, int] = defaultdict(int)
+
+    test_instance._sequence_num = sequence
+    test_instance._flow_num = 0
+    test_instance.pre_sequence()
+
+    for j in range(flows_count if replay is None else len(replay)):
+        if replay is None:
+            valid_flows = [
+                f
+                for f in flows
+                if (not hasattr(f, "max_times") or flows_counter[f] < f.max_times)
+                and (not hasattr(f, "precondition") or f.precondition(test_instance))
+            ]
+            if len(valid_flows) == 0:
+                raise Exception("Could not find a valid flow to run.")
+            if isinstance(test_instance, FixtureFuzzTest):
+                weights = [test_instance.flow_weight(f) for f in valid_flows]
+            else:
+                weights = [f.weight for f in valid_flows]
+            flow = random.choices(valid_flows, weights=weights)[0]
+        else:
+            flow = flows_by_name[replay[j][0]]
+            _set_random_state(replay[j][1])
+
+        test_instance._flow_num = j
+        if states is not None:
+            states.append(_get_random_state())
+        flow_params = [
+            generate(v)
+            for k, v in get_type_hints(flow, include_extras=True).items()
+            if k != "return"
+        ]
+        trace.append(flow.__name__)
+
+        test_instance.pre_flow(flow)
+        ret = flow(test_instance, *flow_params)
+        test_instance.post_flow(flow)
+
+        if isinstance(ret, str):
+            flow_stats[flow.__name__][ret] += 1
+        else:
+            flow_stats[flow.__name__][None] += 1
+            flows_counter[flow] += 1
+
+        test_instance.pre_invariants()
+        for inv in invariants:
+            if invariant_periods[inv] == 0:
+                test_instance.pre_invariant(inv)
+                inv(test_instance)
+                test_instance.post_invariant(inv)
+
+            invariant_periods[inv] += 1
+            if invariant_periods[inv] == inv.period:
+                invariant_periods[inv] = 0
+        test_instance.post_invariants()
+
+    test_instance.post_sequence()
+
+
+def _run_sequences(test_class: type, sequences: List[int], flows_count: int, seed: int) -> FuzzReport:
+    # Runs on the already connected default_chain. Every sequence is appended to a JSONL log
+    # with its seed and flow trace, fuzz_replay.py re-runs (and shrinks) any line of it.
+    report = FuzzReport(test_class.__name__, seed, 0)
+    report.flow_stats = {f.__name__: defaultdict(int) for f in _get_methods(test_class, "flow")}
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{test_class.__name__}-{seed:016x}-{os.getpid()}.jsonl")
+
+    seed_sequence(seed)
+    test_instance = test_class()
+
+    with open(log_path, "a") as log, on_demand_traces(), LastTransaction() as last, _prepared(test_instance):
+        for i in sequences:
+            snapshot = default_chain.snapshot()
+            trace = []
+            error = None
+            seed_sequence(sequence_seed(seed, i))
+            try:
+                run_sequence(test_instance, i, flows_count, report.flow_stats, trace)
+            except Exception as e:
+                error = traceback.format_exc()
+                # traced before the revert below discards the state it ran in
+                call_trace = format_call_trace(e, last.tx)
+                report.failures.append(FuzzFailure(i, sequence_seed(seed, i), trace, error, log_path, call_trace))
+            finally:
+                default_chain.revert(snapshot)
+            report.sequences += 1
+
+            log.write(json.dumps({
+                "test": f"{test_class.__module__}:{test_class.__qualname__}",
+                "campaign_seed": seed,
+                "sequence": i,
+                "accounts": len(default_chain.accounts),
+                "flows": trace,
+                "error": error,
+            }) + "\n")
+            log.flush()
+
+    return report
+
+
+@contextmanager
+def _prepared(test_instance: FuzzTest) -> Iterator[FuzzTest]:
+    # Fixtures go on chain ahead of the per-sequence snapshots, plain FuzzTest subclasses have
+    # nothing to deploy or close.
+    if not isinstance(test_instance, FixtureFuzzTest):
+        yield test_instance
+        return
+    test_instance.setup_fixtures()
+    with test_instance:
+        yield test_instance
+
+
+def _connect_worker(connect_kwargs: dict) -> None:
+    # Pool initializer: connects default_chain to an anvil of this worker's own for the worker's whole
+    # lifetime, anvil is terminated when the pool shuts down.
+    connection = chain_transport.connect_owned(**connect_kwargs)
+    connection.__enter__()
+    multiprocessing.util.Finalize(None, connection.__exit__, args=(None, None, None), exitpriority=10)
+
+
+def _run_shard(test_class: type, sequences: List[int], flows_count: int, seed: int) -> FuzzReport:
+    # A worker may run several shards, each starts from the chain as the worker connected it.
+    snapshot = default_chain.snapshot()
+    try:
+        return _run_sequences(test_class, sequences, flows_count, seed)
+    finally:
+        default_chain.revert(snapshot)
+
+
+def _campaign_seed(seed: Optional[int]) -> int:
+    # drawn from wake's generator by default, so `wake test -S <seed>` pins campaigns too
+    return random.getrandbits(64) if seed is None else seed
+
+
+def _finish(report: FuzzReport, raise_on_failure: bool) -> FuzzReport:
+    add_fuzz_test_stats(report.test, report.flow_stats)
+    if report.failures and raise_on_failure:
+        raise AssertionError(format_failures(report))
+    return report
+
+
+def run_seeded(
+    test_class: type,
+    sequences_count: int,
+    flows_count: int,
+    *,
+    seed: Optional[int] = None,
+    raise_on_failure: bool = True,
+) -> FuzzReport:
+    # In-process counterpart of run_sharded() for a test already connected to default_chain,
+    # with the same per-sequence seeds and logs.
+    seed = _campaign_seed(seed)
+    logger.info("%s: %d sequences, seed %#x", test_class.__name__, sequences_count, seed)
+    return _finish(_run_sequences(test_class, list(range(sequences_count)), flows_count, seed), raise_on_failure)
+
+
+def run_sharded(
+    test_class: type,
+    sequences_count: int,
+    flows_count: int,
+    *,
+    processes: Optional[int] = None,
+    seed: Optional[int] = None,
+    raise_on_failure: bool = True,
+    **connect_kwargs,
+) -> FuzzReport:
+    # Must be called from a test that is not itself connected to default_chain,
+    # every worker process launches and connects to its own anvil.
+    if processes is None:
+        processes = int(os.environ.get("FUZZ_PROCESSES", 0)) or os.cpu_count() or 1
+    processes = max(1, min(processes, sequences_count))
+    seed = _campaign_seed(seed)
+    logger.info("%s: %d sequences on %d workers, seed %#x", test_class.__name__, sequences_count, processes, seed)
+
+    # Round-robin so slow sequences are spread across the workers.
+    shards = [list(range(i, sequences_count, processes)) for i in range(processes)]
+    report = FuzzReport(test_class.__name__, seed, 0)
+    with ProcessPoolExecutor(
+        processes,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_connect_worker,
+        initargs=(connect_kwargs,),
+    ) as executor:
+        futures = [executor.submit(_run_shard, test_class, shard, flows_count, seed) for shard in shards]
+        for future in futures:
+            report.merge(future.result())
+
+    return _finish(report, raise_on_failure)
+
+
+def format_failures(report: FuzzReport) -> str:
+    lines = [f"{len(report.failures)}/{report.sequences} sequences of {report.test} failed (seed {report.seed:#x})"]
+    for failure in report.failures:
+        lines.append(
+            f"\nsequence {failure.sequence} (seed {failure.seed:#x}) after "
+            f"{len(failure.flows)} flows: {' -> '.join(failure.flows[-5:])}\n"
+            f"replay: FUZZ_REPLAY_LOG={failure.log} FUZZ_REPLAY_SEQUENCE={failure.sequence} "
+            f"wake test tests/fuzz_replay.py -s"
+        )
+        lines.append(failure.error)
+        if failure.call_trace is not None:
+            lines.append(failure.call_trace)
+    return "\n".join(lines)
+
+
+########################### REPLAY AND SHRINKING ###########################
+
+# (exception type, file, line) of the innermost frame in the test's own module
+FailureSignature = Tuple[str, str, int]
+
+_worker_test: Optional[FuzzTest] = None
+_worker_snapshot = None
+
+
+def _failure_signature(test_class: type, e: BaseException) -> FailureSignature:
+    frames = traceback.extract_tb(e.__traceback__)
+    module_file = inspect.getsourcefile(test_class)
+    own = [f for f in frames if f.filename == module_file]
+    frame = (own or frames)[-1]
+    return type(e).__name__, frame.filename, frame.lineno
+
+
+def _init_worker(test_class: type, campaign_seed: int, connect_kwargs: dict) -> None:
+    global _worker_test, _worker_snapshot
+    _connect_worker(connect_kwargs)
+
+    seed_sequence(campaign_seed)
+    _worker_test = test_class()
+    if isinstance(_worker_test, FixtureFuzzTest):
+        _worker_test.setup_fixtures()
+    _worker_snapshot = default_chain.snapshot()
+
+
+def _attempt(
+    sequence: int,
+    seed: int,
+    flows_count: int,
+    replay: Optional[List[Step]],
+    record: bool,
+) -> Tuple[Optional[FailureSignature], Optional[str], Optional[List[Step]]]:
+    # Runs one sequence in a worker and reverts the chain afterwards, so attempts never see each other's state.
+    global _worker_snapshot
+    assert _worker_test is not None
+    trace = []
+    states = [] if record else None
+    signature = None
+    error = None
+    seed_sequence(seed)
+    try:
+        run_sequence(_worker_test, sequence, flows_count, defaultdict(lambda: defaultdict(int)), trace, states, replay)
+    except Exception as e:
+        signature = _failure_signature(type(_worker_test), e)
+        error = traceback.format_exc()
+    finally:
+        default_chain.revert(_worker_snapshot)
+        _worker_snapshot = default_chain.snapshot()
+
+    steps = list(zip(trace, states)) if states is not None else None
+    return signature, error, steps
+
+
+class Replayer:
+    # Pool of connected workers that replay one logged sequence and shrink it.
+    test_class: type
+    campaign_seed: int
+    sequence: int
+    seed: int
+    _executor: ProcessPoolExecutor
+
+    def __init__(self, test_class: type, campaign_seed: int, sequence: int, processes: int, connect_kwargs: dict):
+        self.test_class = test_class
+        self.campaign_seed = campaign_seed
+        self.sequence = sequence
+        self.seed = sequence_seed(campaign_seed, sequence)
+        self._executor = ProcessPoolExecutor(
+            processes,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(test_class, campaign_seed, connect_kwargs),
+        )
+
+    def __enter__(self) -> "Replayer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._executor.shutdown()
+
+    def replay(self, flows_count: int) -> Tuple[Optional[FailureSignature], Optional[str], List[Step]]:
+        # Re-runs the sequence exactly as the campaign did, recording the steps.
+        signature, error, steps = self._executor.submit(
+            _attempt, self.sequence, self.seed, flows_count, None, True
+        ).result()
+        assert steps is not None
+        return signature, error, steps
+
+    def replay_steps(self, steps: List[Step]) -> Tuple[Optional[FailureSignature], Optional[str]]:
+        signature, error, _ = self._executor.submit(_attempt, self.sequence, self.seed, 0, steps, False).result()
+        return signature, error
+
+    def run_steps(self, candidates: List[List[Step]]) -> List[Optional[FailureSignature]]:
+        futures = [
+            self._executor.submit(_attempt, self.sequence, self.seed, 0, steps, False)
+            for steps in candidates
+        ]
+        return [f.result()[0] for f in futures]
+
+    def shrink(self, steps: List[Step], signature: FailureSignature) -> List[Step]:
+        # Delta debugging (ddmin): all subsets and complements of one granularity are tried
+        # in parallel, the first that still fails with the same signature is kept.
+        n = 2
+        while len(steps) >= 2:
+            size = len(steps) / n
+            chunks = [steps[round(i * size):round((i + 1) * size)] for i in range(n)]
+            complements = [steps[:round(i * size)] + steps[round((i + 1) * size):] for i in range(n)] if n > 2 else []
+            results = self.run_steps(chunks + complements)
+
+            failing = [i for i, result in enumerate(results) if result == signature]
+            if failing and failing[0] < n:
+                steps, n = chunks[failing[0]], 2
+            elif failing:
+                steps, n = complements[failing[0] - n], max(n - 1, 2)
+            elif n < len(steps):
+                n = min(2 * n, len(steps))
+                continue
+            else:
+                break
+            logger.info("shrinking: %d flows still fail", len(steps))
+
+        if len(steps) == 1 and self.run_steps([[]])[0] == signature:
+            steps = []
+        return steps
@@ -0,0 +1,157 @@
+import csv
+import math
+import os
+import statistics
+import warnings
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Optional, Tuple, Union
+
+from wake.development.core import Contract
+from wake.testing import Address, Chain, default_chain
+
+from .utils import format_table
+
+HEADER = ("kind", "name", "count", "min", "median", "p99", "max")
+
+# Baselines are committed next to the tests and only ever written with GAS_UPDATE_BASELINE=1. Flow
+# inputs are random, so the gas tests run their campaigns from a pinned seed and every run compares the
+# same transactions. The fuzz tests themselves keep drawing fresh seeds and are not profiled.
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "gas_baselines")
+# campaign seed of every profiled fuzz test, changing it invalidates the baselines
+GAS_SEED = 0x50_1ADE
+
+
+def percentile(sorted_values: List[int], p: float) -> int:
+    # nearest-rank percentile of an already sorted list
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+class GasProfile:
+    # Records tx.gas_used of every successful transaction through chain.tx_callback,
+    # grouped by the running fuzz flow and by "<Contract>.<function>".
+    active: Optional["GasProfile"] = None
+
+    flow: Optional[str]
+    flows: DefaultDict[str, List[int]]
+    functions: DefaultDict[str, List[int]]
+    _chain: Chain
+    _contracts: Dict[Address, Tuple[str, Dict[bytes, str]]]
+    _previous_callback = None
+
+    def __init__(self, chain: Chain = default_chain):
+        self.flow = None
+        self.flows = defaultdict(list)
+        self.functions = defaultdict(list)
+        self._chain = chain
+        self._contracts = {}
+
+    def __enter__(self) -> "GasProfile":
+        self._previous_callback = self._chain.tx_callback
+        self._chain.tx_callback = self.record
+        GasProfile.active = self
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._chain.tx_callback = self._previous_callback
+        GasProfile.active = None
+
+    def watch(self, *contracts: Contract) -> None:
+        for contract in contracts:
+            names = {
+                selector: item["name"]
+                for selector, item in type(contract)._abi.items()
+                if isinstance(selector, bytes) and item["type"] == "function"
+            }
+            self._contracts[contract.address] = (type(contract).__name__, names)
+
+    def watch_attributes(self, obj) -> None:
+        # watch every contract stored on obj, e.g. the fixtures of a fuzz test
+        self.watch(*(v for v in vars(obj).values() if isinstance(v, Contract)))
+
+    def record(self, tx) -> None:
+        if self._previous_callback is not None:
+            self._previous_callback(tx)
+        if tx.to is None or tx.error is not None:
+            return
+
+        gas_used = tx.gas_used
+        if self.flow is not None:
+            self.flows[self.flow].append(gas_used)
+
+        selector = bytes(tx.data[:4])
+        contract = self._contracts.get(tx.to.address)
+        if contract is None:
+            name = f"{tx.to.address}.{selector.hex()}"
+        else:
+            name = f"{contract[0]}.{contract[1].get(selector, selector.hex())}"
+        self.functions[name].append(gas_used)
+
+    def rows(self) -> List[Tuple]:
+        rows = []
+        for kind, samples in (("flow", self.flows), ("function", self.functions)):
+            for name in sorted(samples):
+                values = sorted(samples[name])
+                rows.append((
+                    kind,
+                    name,
+                    len(values),
+                    values[0],
+                    statistics.median_low(values),
+                    percentile(values, 99),
+                    values[-1],
+                ))
+        return rows
+
+    def report(self) -> str:
+        return format_table(HEADER, self.rows())
+
+    def write_csv(self, path: Union[str, os.PathLike]) -> None:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(self.rows())
+
+    def check_baseline(self, path: Union[str, os.PathLike], tolerance: float = 0.0) -> None:
+        # Fails when a median or p99 exceeds the stored baseline by more than `tolerance` (a fraction).
+        # GAS_UPDATE_BASELINE=1 (re)writes the baseline instead. A missing baseline, or rows missing
+        # from it, only warn, so new flows and functions do not fail the test before a baseline update.
+        if os.environ.get("GAS_UPDATE_BASELINE", "") == "1":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.write_csv(path)
+            return
+        if not os.path.exists(path):
+            warnings.warn(f"no gas baseline at {path}, generate it with GAS_UPDATE_BASELINE=1")
+            return
+
+        with open(path, newline="") as f:
+            baseline = {(row["kind"], row["name"]): row for row in csv.DictReader(f)}
+
+        regressions = []
+        unbaselined = []
+        for kind, name, _, _, median, p99, _ in self.rows():
+            row = baseline.get((kind, name))
+            if row is None:
+                unbaselined.append(f"{kind} {name}")
+                continue
+            for column, value in (("median", median), ("p99", p99)):
+                limit = int(row[column]) * (1 + tolerance)
+                if value > limit:
+                    regressions.append(f"{kind} {name} {column}: {value} > {row[column]}")
+
+        if unbaselined:
+            warnings.warn(
+                f"{len(unbaselined)} rows have no gas baseline in {path}, update it with GAS_UPDATE_BASELINE=1: "
+                + ", ".join(unbaselined)
+            )
+        assert not regressions, "Gas regressions against " + str(path) + ":\n" + "\n".join(regressions)
+
+    def finish(self, name: str, tolerance: float = 0.05) -> None:
+        # Prints the report, exports it to $GAS_REPORT_DIR/<name>.csv when set
+        # and checks it against gas_baselines/<name>.csv.
+        print()
+        print(self.report())
+        report_dir = os.environ.get("GAS_REPORT_DIR")
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+            self.write_csv(os.path.join(report_dir, f"{name}.csv"))
+        self.check_baseline(os.path.join(BASELINE_DIR, f"{name}.csv"), tolerance)
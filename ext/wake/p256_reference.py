@@ -0,0 +1,211 @@
+import json
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Python P-256 (secp256r1) ECDSA verifier mirroring src/utils/P256.sol. Points are added in
+# Jacobian coordinates against precomputed affine window tables: a scalar multiple of a tabled
+# point is 64 mixed additions and no doublings. G is tabled once. A table costs about four plain
+# multiplications to build, so public keys are tabled from their second use, before that they
+# are multiplied with a 4-bit window.
+
+P = 0xFFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF
+B = 0x5AC635D8AA3A93E7B3EBBD55769886BC651D06B0CC53B0F63BCE3C3E27D2604B
+N = 0xFFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551
+HALF_N = N // 2
+GX = 0x6B17D1F2E12C4247F8BCE6E563A440F277037D812DEB33A0F4A13945D898C296
+GY = 0x4FE342E2FE1A7F9B8EE7EB4A7C0F9E162BCE33576B315ECECBB6406837BF51F5
+
+WINDOW = 4
+WINDOWS = 256 // WINDOW
+WINDOW_MASK = (1 << WINDOW) - 1
+
+Jacobian = Tuple[int, int, int]
+Affine = Tuple[int, int]
+Table = List[List[Optional[Affine]]]
+
+INFINITY: Jacobian = (1, 1, 0)
+
+
+def _double(p: Jacobian) -> Jacobian:
+    # dbl-2001-b, a = -3
+    x1, y1, z1 = p
+    if z1 == 0 or y1 == 0:
+        return INFINITY
+    delta = z1 * z1 % P
+    gamma = y1 * y1 % P
+    beta = x1 * gamma % P
+    alpha = 3 * (x1 - delta) * (x1 + delta) % P
+    x3 = (alpha * alpha - 8 * beta) % P
+    z3 = ((y1 + z1) * (y1 + z1) - gamma - delta) % P
+    y3 = (alpha * (4 * beta - x3) - 8 * gamma * gamma) % P
+    return x3, y3, z3
+
+
+def _add_affine(p: Jacobian, q: Affine) -> Jacobian:
+    x1, y1, z1 = p
+    x2, y2 = q
+    if z1 == 0:
+        return x2, y2, 1
+    z1z1 = z1 * z1 % P
+    h = (x2 * z1z1 - x1) % P
+    r = (y2 * z1 * z1z1 - y1) % P
+    if h == 0:
+        return _double(p) if r == 0 else INFINITY
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    y3 = (r * (v - x3) - y1 * hhh) % P
+    return x3, y3, z1 * h % P
+
+
+def _add(p: Jacobian, q: Jacobian) -> Jacobian:
+    x1, y1, z1 = p
+    x2, y2, z2 = q
+    if z1 == 0:
+        return q
+    if z2 == 0:
+        return p
+    z1z1 = z1 * z1 % P
+    z2z2 = z2 * z2 % P
+    u1 = x1 * z2z2 % P
+    s1 = y1 * z2 * z2z2 % P
+    h = (x2 * z1z1 - u1) % P
+    r = (y2 * z1 * z1z1 - s1) % P
+    if h == 0:
+        return _double(p) if r == 0 else INFINITY
+    hh = h * h % P
+    hhh = h * hh % P
+    v = u1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    y3 = (r * (v - x3) - s1 * hhh) % P
+    return x3, y3, z1 * z2 * h % P
+
+
+def _to_affine(p: Jacobian) -> Optional[Affine]:
+    x, y, z = p
+    if z == 0:
+        return None
+    z_inv = pow(z, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return x * z_inv2 % P, y * z_inv2 * z_inv % P
+
+
+def is_on_curve(x: int, y: int) -> bool:
+    return 0 <= x < P and 0 <= y < P and (y * y - x * x * x + 3 * x - B) % P == 0
+
+
+def _build_table(point: Affine) -> Table:
+    # table[i][d] = d * 16^i * point, None where that multiple is the point at infinity
+    table = []
+    base: Jacobian = (point[0], point[1], 1)
+    for _ in range(WINDOWS):
+        row: List[Optional[Affine]] = [None]
+        multiple = INFINITY
+        for _ in range(WINDOW_MASK):
+            multiple = _add(multiple, base)
+            row.append(_to_affine(multiple))
+        table.append(row)
+        for _ in range(WINDOW):
+            base = _double(base)
+    return table
+
+
+@lru_cache(maxsize=1)
+def _g_table() -> Table:
+    return _build_table((GX, GY))
+
+
+@lru_cache(maxsize=256)
+def _key_table(x: int, y: int) -> Table:
+    return _build_table((x, y))
+
+
+_seen_keys = set()
+
+
+def _multiply_key(x: int, y: int, k: int) -> Jacobian:
+    if (x, y) in _seen_keys:
+        return _multiply(_key_table(x, y), k)
+    if len(_seen_keys) > 4096:
+        _seen_keys.clear()
+    _seen_keys.add((x, y))
+
+    multiples = [INFINITY, (x, y, 1)]
+    for _ in range(WINDOW_MASK - 1):
+        multiples.append(_add_affine(multiples[-1], (x, y)))
+    acc = INFINITY
+    for shift in range(256 - WINDOW, -1, -WINDOW):
+        for _ in range(WINDOW):
+            acc = _double(acc)
+        acc = _add(acc, multiples[(k >> shift) & WINDOW_MASK])
+    return acc
+
+
+def _multiply(table: Table, k: int) -> Jacobian:
+    acc = INFINITY
+    for row in table:
+        q = row[k & WINDOW_MASK]
+        if q is not None:
+            acc = _add_affine(acc, q)
+        k >>= WINDOW
+    return acc
+
+
+def verify_allow_malleability(hash: bytes, r: int, s: int, x: int, y: int) -> bool:
+    # P256.verifySignatureAllowMalleability with the RIP-7212 precompile or the verifier behind it.
+    if not (0 < r < N and 0 < s < N and is_on_curve(x, y)):
+        return False
+    w = pow(s, -1, N)
+    u1 = int.from_bytes(hash, "big") * w % N
+    u2 = r * w % N
+    point = _to_affine(_add(_multiply(_g_table(), u1), _multiply_key(x, y, u2)))
+    return point is not None and point[0] % N == r
+
+
+def verify(hash: bytes, r: int, s: int, x: int, y: int) -> bool:
+    # P256.verifySignature, which also rejects s above N / 2
+    return s <= HALF_N and verify_allow_malleability(hash, r, s, x, y)
+
+
+def public_key(private_key: int) -> Affine:
+    point = _to_affine(_multiply(_g_table(), private_key))
+    assert point is not None
+    return point
+
+
+def sign(private_key: int, hash: bytes, k: int) -> Tuple[int, int]:
+    # (r, s) with nonce k in [1, N), s normalized to the lower half as P256.verifySignature requires.
+    # Returns (0, 0) for the negligible nonces that give r or s of zero, callers draw a new one.
+    point = _to_affine(_multiply(_g_table(), k))
+    r = point[0] % N if point is not None else 0
+    s = pow(k, -1, N) * (int.from_bytes(hash, "big") + r * private_key) % N
+    if r == 0 or s == 0:
+        return 0, 0
+    return r, min(s, N - s)
+
+
+def read_vectors(path: str) -> Iterator[dict]:
+    # Streams a Wycheproof-style JSONL file (test/data/wycheproof.jsonl), one vector per line,
+    # with the hex fields decoded: hash as bytes, r, s, x and y as ints.
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            vector = json.loads(line)
+            vector["hash"] = bytes.fromhex(vector["hash"])
+            for key in ("r", "s", "x", "y"):
+                vector[key] = int(vector[key], 16)
+            yield vector
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def verify_batch(vectors: Sequence[dict], allow_malleability: bool = True) -> List[bool]:
+    fn = verify_allow_malleability if allow_malleability else verify
+    return [fn(v["hash"], v["r"], v["s"], v["x"], v["y"]) for v in vectors]
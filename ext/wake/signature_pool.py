@@ -0,0 +1,120 @@
+import atexit
+import random as _random
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional, Tuple
+from weakref import WeakSet
+
+from Crypto.Hash import keccak
+from eth_keys import keys
+
+# Signing in pure Python costs milliseconds per signature, about as much as the calls checking it.
+# A SignaturePool signs ahead in a process pool while the test keeps sending calls.
+
+BATCH = 32
+
+_executor: Optional[ProcessPoolExecutor] = None
+# pools not closed yet, e.g. by a sequence that raised before its post_sequence
+_open_pools: "WeakSet[PresignedPool]" = WeakSet()
+
+
+@dataclass(frozen=True)
+class SignedHash:
+    data: bytes
+    hash: bytes
+    signature: bytes
+    r: bytes
+    s: bytes
+    v: int
+    # EIP-2098 compact form, the parity of v folded into the top bit of s
+    vs: bytes
+
+
+def compact_vs(s: bytes, v: int) -> bytes:
+    return s if v == 27 else bytes([s[0] | 0x80]) + s[1:]
+
+
+def sign_hash(private_key: bytes, hash: bytes, data: bytes = b"") -> SignedHash:
+    # Same signature as Account.sign_hash: RFC 6979 nonce, low s, v in {27, 28}.
+    signature = keys.PrivateKey(private_key).sign_msg_hash(hash)
+    r = signature.r.to_bytes(32, "big")
+    s = signature.s.to_bytes(32, "big")
+    v = signature.v + 27
+    return SignedHash(data, hash, r + s + bytes([v]), r, s, v, compact_vs(s, v))
+
+
+def _sign_batch(private_key: bytes, seed: int, start: int, count: int) -> List[SignedHash]:
+    # Messages come from a generator seeded by (seed, index), independent of the worker and the
+    # batch they land in, so a pool with the same seed yields the same items in the same order.
+    ret = []
+    for i in range(start, start + count):
+        rng = _random.Random(seed * 0x100000000 + i)
+        length = rng.randint(0, 1000)
+        data = rng.getrandbits(8 * length).to_bytes(length, "big")
+        ret.append(sign_hash(private_key, keccak.new(data=data, digest_bits=256).digest(), data))
+    return ret
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+    return _executor
+
+
+@atexit.register
+def _shutdown() -> None:
+    # batches still queued by a pool left open are dropped, not signed
+    for pool in list(_open_pools):
+        pool.close()
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+
+
+class PresignedPool:
+    # Bounded queue of items produced ahead in a process pool, `size` of them at most. Batches are
+    # fn(*args, seed, start, count), which must derive item i from (seed, i) alone.
+    _fn: Callable[..., List]
+    _args: Tuple
+    _seed: int
+    _next: int
+    _batches: Deque[Future]
+    _buffer: Deque
+
+    def __init__(self, fn: Callable[..., List], args: Tuple, seed: int, size: int = 8 * BATCH):
+        self._fn = fn
+        self._args = args
+        self._seed = seed
+        self._next = 0
+        self._batches = deque()
+        self._buffer = deque()
+        _open_pools.add(self)
+        for _ in range(max(1, size // BATCH)):
+            self._submit()
+
+    def _submit(self) -> None:
+        self._batches.append(_get_executor().submit(self._fn, *self._args, self._seed, self._next, BATCH))
+        self._next += BATCH
+
+    def get(self):
+        if not self._buffer:
+            self._buffer.extend(self._batches.popleft().result())
+            self._submit()
+        return self._buffer.popleft()
+
+    def close(self) -> None:
+        for batch in self._batches:
+            batch.cancel()
+        self._batches.clear()
+        self._buffer.clear()
+        _open_pools.discard(self)
+
+
+class SignaturePool(PresignedPool):
+    # Signatures of random messages by one secp256k1 key.
+    def __init__(self, private_key: bytes, seed: int, size: int = 8 * BATCH):
+        super().__init__(_sign_batch, (private_key,), seed, size)
+
+    def get(self) -> SignedHash:
+        return super().get()
@@ -2,8 +2,11 @@ from dataclasses import dataclass, field
 
 from eth_account._utils.structured_data.hashing import hash_message
 from wake.testing import *
-from pytypes.src.utils.ERC1967Factory import ERC1967Factory
-from pytypes.tests.EIP712Mock import EIP712Mock
+
+from .utils import LazyContract
+
+ERC1967Factory = LazyContract("pytypes.src.utils.ERC1967Factory", "ERC1967Factory")
+EIP712Mock = LazyContract("pytypes.tests.EIP712Mock", "EIP712Mock")
 
 
 @dataclass
@@ -1,10 +1,14 @@
 from dataclasses import dataclass, field
 
-from eth_account._utils.structured_data.hashing import hash_message
 from wake.testing import *
 from wake.testing.fuzzing import *
-from pytypes.src.utils.ERC1967Factory import ERC1967Factory
-from pytypes.tests.EIP712Mock import EIP712Mock
+
+from .eip712 import DomainCache, hash_struct
+from .fuzz_runner import FixtureFuzzTest
+from .utils import LazyContract
+
+ERC1967Factory = LazyContract("pytypes.src.utils.ERC1967Factory", "ERC1967Factory")
+EIP712Mock = LazyContract("pytypes.tests.EIP712Mock", "EIP712Mock")
 
 
 @dataclass
@@ -20,45 +24,40 @@ class Mail:
     contents: str
 
 
-class Eip712FuzzTest(FuzzTest):
+class Eip712FuzzTest(FixtureFuzzTest):
     _proxy_factory: ERC1967Factory
     _eip712: EIP712Mock
     _eip712_proxy: EIP712Mock
     _signer: Account
+    _domains: DomainCache
 
-    def __init__(self):
+    def deploy_fixtures(self) -> None:
         self._proxy_factory = ERC1967Factory.deploy()
-
-    def pre_sequence(self) -> None:
         self._eip712 = EIP712Mock.deploy()
-        self._signer = Account.new()
         self._eip712_proxy = EIP712Mock(
-            self._proxy_factory.deploy_(self._eip712, self._signer).return_value
+            self._proxy_factory.deploy_(self._eip712, default_chain.accounts[0]).return_value
         )
+        self._domains = DomainCache()
+
+    def pre_sequence(self) -> None:
+        super().pre_sequence()
+        self._signer = Account.new()
 
     @flow()
     def sign_flow(self, mail: Mail) -> None:
-        mail_hash = hash_message(self._signer._prepare_eip712_dict(mail, Eip712Domain(), False))
-
-        sign1 = self._signer.sign_hash(self._eip712.hashTypedData(mail_hash))
-        sign2 = self._signer.sign_structured(mail, Eip712Domain(
-            name=self._eip712.NAME(),
-            version=self._eip712.VERSION(),
-            chainId=default_chain.chain_id,
-            verifyingContract=self._eip712.address,
-        ))
-        assert sign1 == sign2
+        mail_hash = hash_struct(mail)
+        for eip712 in (self._eip712, self._eip712_proxy):
+            assert eip712.hashTypedData(mail_hash) == self._domains.hash_typed_data(eip712, mail)
 
-        sign1 = self._signer.sign_hash(self._eip712_proxy.hashTypedData(mail_hash))
-        sign2 = self._signer.sign_structured(mail, Eip712Domain(
-            name=self._eip712_proxy.NAME(),
-            version=self._eip712_proxy.VERSION(),
-            chainId=default_chain.chain_id,
-            verifyingContract=self._eip712_proxy.address,
-        ))
-        assert sign1 == sign2
+    @flow(weight=10)
+    def sign_structured_flow(self, mail: Mail) -> None:
+        # the cached hasher against Account.sign_structured, which builds the typed data dict every time
+        for eip712 in (self._eip712, self._eip712_proxy):
+            sign1 = self._signer.sign_hash(self._domains.hash_typed_data(eip712, mail))
+            sign2 = self._signer.sign_structured(mail, self._domains.domain(eip712))
+            assert sign1 == sign2
 
 
 @default_chain.connect()
 def test_eip712_fuzz():
-    Eip712FuzzTest().run(10, 10)
+    Eip712FuzzTest.run(10, 10)
@@ -1,5 +1,9 @@
 from wake.testing import *
-from pytypes.tests.ERC1155Mock import ERC1155Mock, ERC1155ReceiverMock
+
+from .utils import LazyContract
+
+ERC1155Mock = LazyContract("pytypes.tests.ERC1155Mock", "ERC1155Mock")
+ERC1155ReceiverMock = LazyContract("pytypes.tests.ERC1155Mock", "ERC1155ReceiverMock")
 
 
 @default_chain.connect()
@@ -1,28 +1,73 @@
 import logging
 from collections import defaultdict
 import random
-from typing import DefaultDict, Set
+from typing import DefaultDict, Set, Tuple
 
 from wake.testing import *
 from wake.testing.fuzzing import *
-from pytypes.tests.ERC1155Mock import ERC1155Mock
+
+from .fuzz_runner import FixtureFuzzTest, run_seeded
+from .gas_profile import GAS_SEED, GasProfile
+from .utils import LazyContract, RandomAccessSet
+
+ERC1155Mock = LazyContract("pytypes.tests.ERC1155Mock", "ERC1155Mock")
 
 
 logger = logging.getLogger(__name__)
 #logger.setLevel(logging.DEBUG)
 
 
-class ERC1155FuzzTest(FuzzTest):
+class ERC1155FuzzTest(FixtureFuzzTest):
     _erc1155: ERC1155Mock
     _balances: DefaultDict[Account, DefaultDict[uint256, uint256]]
+    # ids with a nonzero balance per account, kept in sync by _credit/_debit
+    _held: DefaultDict[Account, RandomAccessSet[uint256]]
     _approvals: DefaultDict[Account, Set[Account]]
     _token_ids: List[uint256]
+    # (account, id) pairs touched since the last reconciliation with the chain
+    _touched: Set[Tuple[Account, uint256]]
 
-    def pre_sequence(self) -> None:
+    def deploy_fixtures(self) -> None:
         self._erc1155 = ERC1155Mock.deploy(True)
+
+    def pre_sequence(self) -> None:
+        super().pre_sequence()
         self._balances = defaultdict(lambda: defaultdict(lambda: 0))
+        self._held = defaultdict(RandomAccessSet)
         self._approvals = defaultdict(set)
         self._token_ids = [random_int(0, 2 ** 256 - 1, edge_values_prob=0.25) for _ in range(10)]
+        self._touched = set()
+
+    def coverage_state(self):
+        # number of holders and of operator approvals, bucketed by magnitude
+        holders = sum(1 for held in self._held.values() if len(held) > 0)
+        approvals = sum(len(operators) for operators in self._approvals.values())
+        return holders.bit_length(), approvals.bit_length()
+
+    def post_sequence(self) -> None:
+        super().post_sequence()
+        # Full sweep of every account and token id, touched or not, in a single call.
+        self._check_balances([(a, id) for a in default_chain.accounts for id in self._token_ids])
+
+    def _credit(self, account: Account, id: uint256, amount: uint256) -> None:
+        self._balances[account][id] += amount
+        if amount > 0:
+            self._held[account].add(id)
+
+    def _debit(self, account: Account, id: uint256, amount: uint256) -> None:
+        self._balances[account][id] -= amount
+        if self._balances[account][id] == 0:
+            self._held[account].discard(id)
+
+    def _touch(self, account: Account, ids: List[uint256]) -> None:
+        self._touched.update((account, id) for id in ids)
+
+    def _check_balances(self, pairs: List[Tuple[Account, uint256]]) -> None:
+        if len(pairs) == 0:
+            return
+        accounts = [a for a, _ in pairs]
+        ids = [id for _, id in pairs]
+        assert self._erc1155.balanceOfBatch(accounts, ids) == [self._balances[a][id] for a, id in pairs]
 
     @flow()
     def flow_mint(self, payload: bytearray) -> None:
@@ -30,6 +75,7 @@ class ERC1155FuzzTest(FuzzTest):
         id = random.choice(self._token_ids)
         amount = random_int(0, 2 ** 256 - 1, edge_values_prob=0.05)
 
+        self._touch(a, [id])
         try:
             tx = self._erc1155.mint(a, id, amount, payload)
             assert self._balances[a][id] + amount < 2 ** 256
@@ -38,7 +84,7 @@ class ERC1155FuzzTest(FuzzTest):
                 ERC1155Mock.TransferSingle(tx.from_.address, Address.ZERO, a.address, id, amount),
                 ERC1155Mock.AfterTokenTransfer(Address.ZERO, a.address, [id], [amount], payload),
             ]
-            self._balances[a][id] += amount
+            self._credit(a, id, amount)
 
             logger.debug(f"Minted {amount} of {id} to {a}")
         except UnknownTransactionRevertedError as e:
@@ -53,11 +99,12 @@ class ERC1155FuzzTest(FuzzTest):
         ids = [random.choice(self._token_ids) for _ in range(random_int(0, 10, edge_values_prob=0.05))]
         amounts = [random_int(0, 2 ** 256 - 1, edge_values_prob=0.05) for _ in range(len(ids))]
 
+        self._touch(a, ids)
         try:
             tx = self._erc1155.batchMint(a, ids, amounts, payload)
             for id, amount in zip(ids, amounts):
                 assert self._balances[a][id] + amount < 2 ** 256
-                self._balances[a][id] += amount
+                self._credit(a, id, amount)
             assert tx.events == [
                 ERC1155Mock.BeforeTokenTransfer(Address.ZERO, a.address, ids, amounts, payload),
                 ERC1155Mock.TransferBatch(tx.from_.address, Address.ZERO, a.address, ids, amounts),
@@ -78,8 +125,8 @@ class ERC1155FuzzTest(FuzzTest):
     def flow_burn(self) -> None:
         owner = random_account()
 
-        if random.random() < 0.8 and sum(self._balances[owner].values()) > 0:
-            id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+        if random.random() < 0.8 and len(self._held[owner]) > 0:
+            id = self._held[owner].choice()
         else:
             id = random.choice(self._token_ids)
 
@@ -93,6 +140,7 @@ class ERC1155FuzzTest(FuzzTest):
             [0.5 if a == owner else 0.5 / (len(default_chain.accounts) - 1) for a in default_chain.accounts]
         )[0]
 
+        self._touch(owner, [id])
         try:
             tx = self._erc1155.burn(owner, id, amount, from_=operator)
             assert tx.events == [
@@ -101,7 +149,7 @@ class ERC1155FuzzTest(FuzzTest):
                 ERC1155Mock.AfterTokenTransfer(owner.address, Address.ZERO, [id], [amount], bytearray()),
             ]
             assert self._balances[owner][id] - amount >= 0
-            self._balances[owner][id] -= amount
+            self._debit(owner, id, amount)
 
             assert operator == owner or operator in self._approvals[owner]
 
@@ -123,8 +171,8 @@ class ERC1155FuzzTest(FuzzTest):
         ids = []
         amounts = []
         for _ in range(random_int(0, 10, edge_values_prob=0.05)):
-            if random.random() < 0.98 and sum(self._balances[owner].values()) > 0:
-                id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+            if random.random() < 0.98 and len(self._held[owner]) > 0:
+                id = self._held[owner].choice()
                 ids.append(id)
                 if self._balances[owner][id] == 0:
                     amount = random.choice([0, 1])
@@ -142,6 +190,7 @@ class ERC1155FuzzTest(FuzzTest):
             [0.5 if a == owner else 0.5 / (len(default_chain.accounts) - 1) for a in default_chain.accounts]
         )[0]
 
+        self._touch(owner, ids)
         try:
             tx = self._erc1155.batchBurn(owner, ids, amounts, from_=operator)
             assert tx.events == [
@@ -151,7 +200,7 @@ class ERC1155FuzzTest(FuzzTest):
             ]
             for id, amount in zip(ids, amounts):
                 assert self._balances[owner][id] - amount >= 0
-                self._balances[owner][id] -= amount
+                self._debit(owner, id, amount)
 
             assert operator == owner or operator in self._approvals[owner]
 
@@ -173,8 +222,8 @@ class ERC1155FuzzTest(FuzzTest):
     def flow_burn_unchecked(self) -> None:
         owner = random_account()
 
-        if random.random() < 0.8 and sum(self._balances[owner].values()) > 0:
-            id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+        if random.random() < 0.8 and len(self._held[owner]) > 0:
+            id = self._held[owner].choice()
         else:
             id = random.choice(self._token_ids)
 
@@ -189,6 +238,7 @@ class ERC1155FuzzTest(FuzzTest):
         )[0]
         executor = random_account()
 
+        self._touch(owner, [id])
         try:
             tx = self._erc1155.burnUnchecked(operator, owner, id, amount, from_=executor)
             assert tx.events == [
@@ -197,7 +247,7 @@ class ERC1155FuzzTest(FuzzTest):
                 ERC1155Mock.AfterTokenTransfer(owner.address, Address.ZERO, [id], [amount], bytearray()),
             ]
             assert self._balances[owner][id] - amount >= 0
-            self._balances[owner][id] -= amount
+            self._debit(owner, id, amount)
 
             assert operator == owner or operator == Account(0) or operator in self._approvals[owner]
 
@@ -219,8 +269,8 @@ class ERC1155FuzzTest(FuzzTest):
         ids = []
         amounts = []
         for _ in range(random_int(0, 10, edge_values_prob=0.05)):
-            if random.random() < 0.98 and sum(self._balances[owner].values()) > 0:
-                id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+            if random.random() < 0.98 and len(self._held[owner]) > 0:
+                id = self._held[owner].choice()
                 ids.append(id)
                 if self._balances[owner][id] == 0:
                     amount = random.choice([0, 1])
@@ -239,6 +289,7 @@ class ERC1155FuzzTest(FuzzTest):
         )[0]
         executor = random_account()
 
+        self._touch(owner, ids)
         try:
             tx = self._erc1155.batchBurnUnchecked(operator, owner, ids, amounts, from_=executor)
             assert tx.events == [
@@ -248,7 +299,7 @@ class ERC1155FuzzTest(FuzzTest):
             ]
             for id, amount in zip(ids, amounts):
                 assert self._balances[owner][id] - amount >= 0
-                self._balances[owner][id] -= amount
+                self._debit(owner, id, amount)
 
             assert operator == owner or operator == Account(0) or operator in self._approvals[owner]
 
@@ -308,8 +359,8 @@ class ERC1155FuzzTest(FuzzTest):
         owner = random_account()
         recipient = random_account()
 
-        if random.random() < 0.8 and sum(self._balances[owner].values()) > 0:
-            id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+        if random.random() < 0.8 and len(self._held[owner]) > 0:
+            id = self._held[owner].choice()
         else:
             id = random.choice(self._token_ids)
 
@@ -323,6 +374,8 @@ class ERC1155FuzzTest(FuzzTest):
             [0.5 if a == owner else 0.5 / (len(default_chain.accounts) - 1) for a in default_chain.accounts]
         )[0]
 
+        self._touch(owner, [id])
+        self._touch(recipient, [id])
         try:
             tx = self._erc1155.safeTransferFrom(owner, recipient, id, amount, payload, from_=operator)
             assert tx.events == [
@@ -331,9 +384,9 @@ class ERC1155FuzzTest(FuzzTest):
                 ERC1155Mock.AfterTokenTransfer(owner.address, recipient.address, [id], [amount], payload),
             ]
             assert self._balances[owner][id] - amount >= 0
-            self._balances[owner][id] -= amount
+            self._debit(owner, id, amount)
             assert self._balances[recipient][id] + amount <= 2 ** 256 - 1
-            self._balances[recipient][id] += amount
+            self._credit(recipient, id, amount)
 
             assert operator == owner or operator in self._approvals[owner]
 
@@ -356,8 +409,8 @@ class ERC1155FuzzTest(FuzzTest):
         ids = []
         amounts = []
         for _ in range(random_int(0, 10, edge_values_prob=0.05)):
-            if random.random() < 0.98 and sum(self._balances[owner].values()) > 0:
-                id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+            if random.random() < 0.98 and len(self._held[owner]) > 0:
+                id = self._held[owner].choice()
                 ids.append(id)
                 if self._balances[owner][id] == 0:
                     amount = random.choice([0, 1])
@@ -375,6 +428,7 @@ class ERC1155FuzzTest(FuzzTest):
             [0.5 if a == owner else 0.5 / (len(default_chain.accounts) - 1) for a in default_chain.accounts]
         )[0]
 
+        self._touch(owner, ids)
         try:
             tx = self._erc1155.safeBatchTransferFrom(owner, owner, ids, amounts, payload, from_=operator)
             assert tx.events == [
@@ -384,9 +438,9 @@ class ERC1155FuzzTest(FuzzTest):
             ]
             for id, amount in zip(ids, amounts):
                 assert self._balances[owner][id] - amount >= 0
-                self._balances[owner][id] -= amount
+                self._debit(owner, id, amount)
                 assert self._balances[owner][id] + amount <= 2 ** 256 - 1
-                self._balances[owner][id] += amount
+                self._credit(owner, id, amount)
 
             assert operator == owner or operator in self._approvals[owner]
 
@@ -414,8 +468,8 @@ class ERC1155FuzzTest(FuzzTest):
         owner = random_account()
         recipient = random_account()
 
-        if random.random() < 0.8 and sum(self._balances[owner].values()) > 0:
-            id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+        if random.random() < 0.8 and len(self._held[owner]) > 0:
+            id = self._held[owner].choice()
         else:
             id = random.choice(self._token_ids)
 
@@ -430,6 +484,8 @@ class ERC1155FuzzTest(FuzzTest):
         )[0]
         executor = random_account()
 
+        self._touch(owner, [id])
+        self._touch(recipient, [id])
         try:
             tx = self._erc1155.safeTransferUnchecked(operator, owner, recipient, id, amount, payload, from_=executor)
             assert tx.events == [
@@ -438,9 +494,9 @@ class ERC1155FuzzTest(FuzzTest):
                 ERC1155Mock.AfterTokenTransfer(owner.address, recipient.address, [id], [amount], payload),
             ]
             assert self._balances[owner][id] - amount >= 0
-            self._balances[owner][id] -= amount
+            self._debit(owner, id, amount)
             assert self._balances[recipient][id] + amount <= 2 ** 256 - 1
-            self._balances[recipient][id] += amount
+            self._credit(recipient, id, amount)
 
             assert operator == owner or operator == Account(0) or operator in self._approvals[owner]
 
@@ -463,8 +519,8 @@ class ERC1155FuzzTest(FuzzTest):
         ids = []
         amounts = []
         for _ in range(random_int(0, 10, edge_values_prob=0.05)):
-            if random.random() < 0.98 and sum(self._balances[owner].values()) > 0:
-                id = random.choice([k for k in self._balances[owner].keys() if self._balances[owner][k] > 0])
+            if random.random() < 0.98 and len(self._held[owner]) > 0:
+                id = self._held[owner].choice()
                 ids.append(id)
                 if self._balances[owner][id] == 0:
                     amount = random.choice([0, 1])
@@ -483,6 +539,7 @@ class ERC1155FuzzTest(FuzzTest):
         )[0]
         executor = random_account()
 
+        self._touch(owner, ids)
         try:
             tx = self._erc1155.safeBatchTransferUnchecked(operator, owner, owner, ids, amounts, payload, from_=executor)
             assert tx.events == [
@@ -492,9 +549,9 @@ class ERC1155FuzzTest(FuzzTest):
             ]
             for id, amount in zip(ids, amounts):
                 assert self._balances[owner][id] - amount >= 0
-                self._balances[owner][id] -= amount
+                self._debit(owner, id, amount)
                 assert self._balances[owner][id] + amount <= 2 ** 256 - 1
-                self._balances[owner][id] += amount
+                self._credit(owner, id, amount)
 
             assert operator == owner or operator == Account(0) or operator in self._approvals[owner]
 
@@ -517,12 +574,18 @@ class ERC1155FuzzTest(FuzzTest):
 
             logger.debug(f"Failed to transfer {amounts} of {ids} from {owner} to {owner}")
 
-    @invariant(period=20)
+    @invariant()
     def invariant_balances(self) -> None:
-        for a, balances in self._balances.items():
-            assert self._erc1155.balanceOfBatch([a] * len(balances), list(balances.keys())) == list(balances.values())
-            for id, balance in balances.items():
-                assert self._erc1155.balanceOf(a, id) == balance
+        # Reconcile only what the last flow touched (reverted flows included), one balanceOfBatch per step.
+        self._check_balances(list(self._touched))
+        self._touched.clear()
+
+    @invariant(period=20)
+    def invariant_balance_of(self) -> None:
+        # balanceOf is still exercised on its own, sampled rather than swept.
+        a = random_account()
+        id = random.choice(self._token_ids)
+        assert self._erc1155.balanceOf(a, id) == self._balances[a][id]
 
     @invariant(period=20)
     def invariant_approvals(self) -> None:
@@ -533,4 +596,12 @@ class ERC1155FuzzTest(FuzzTest):
 
 @default_chain.connect(accounts=20)
 def test_erc1155_fuzz():
-    ERC1155FuzzTest().run(1, 100)
+    run_seeded(ERC1155FuzzTest, 1, 100)
+
+
+@default_chain.connect(accounts=20)
+def test_erc1155_gas():
+    # same campaign size as the fuzz test, from the seed the committed baseline was recorded with
+    with GasProfile() as gas:
+        run_seeded(ERC1155FuzzTest, 1, 100, seed=GAS_SEED)
+    gas.finish("erc1155")
@@ -1,23 +1,26 @@
 from wake.testing import *
 
-from pytypes.tests.ERC20Mock import ERC20Mock
-from pytypes.tests.NoETHMock import NoETHMock
-from pytypes.tests.weird.Approval import ApprovalRaceToken
-from pytypes.tests.weird.ApprovalToZero import ApprovalToZeroToken
-from pytypes.tests.weird.BlockList import BlockableToken
-from pytypes.tests.weird.HighDecimals import HighDecimalToken
-from pytypes.tests.weird.Bytes32Metadata import ERC20 as Bytes32MetadataToken
-from pytypes.tests.weird.MissingReturns import MissingReturnToken
-from pytypes.tests.weird.NoRevert import NoRevertToken
-from pytypes.tests.weird.Pausable import PausableToken
-from pytypes.tests.weird.Proxied import ProxiedToken, TokenProxy
-from pytypes.tests.weird.Reentrant import ReentrantToken
-from pytypes.tests.weird.ReturnsFalse import ReturnsFalseToken
-from pytypes.tests.weird.TransferFee import TransferFeeToken
-from pytypes.tests.weird.Uint96 import Uint96ERC20
-from pytypes.tests.weird.Upgradable import Proxy as UpgradableToken
-
-from pytypes.src.utils.SafeTransferLib import SafeTransferLib
+from .utils import LazyContract
+
+ERC20Mock = LazyContract("pytypes.tests.ERC20Mock", "ERC20Mock")
+NoETHMock = LazyContract("pytypes.tests.NoETHMock", "NoETHMock")
+ApprovalRaceToken = LazyContract("pytypes.tests.weird.Approval", "ApprovalRaceToken")
+ApprovalToZeroToken = LazyContract("pytypes.tests.weird.ApprovalToZero", "ApprovalToZeroToken")
+BlockableToken = LazyContract("pytypes.tests.weird.BlockList", "BlockableToken")
+HighDecimalToken = LazyContract("pytypes.tests.weird.HighDecimals", "HighDecimalToken")
+Bytes32MetadataToken = LazyContract("pytypes.tests.weird.Bytes32Metadata", "ERC20")
+MissingReturnToken = LazyContract("pytypes.tests.weird.MissingReturns", "MissingReturnToken")
+NoRevertToken = LazyContract("pytypes.tests.weird.NoRevert", "NoRevertToken")
+PausableToken = LazyContract("pytypes.tests.weird.Pausable", "PausableToken")
+ProxiedToken = LazyContract("pytypes.tests.weird.Proxied", "ProxiedToken")
+TokenProxy = LazyContract("pytypes.tests.weird.Proxied", "TokenProxy")
+ReentrantToken = LazyContract("pytypes.tests.weird.Reentrant", "ReentrantToken")
+ReturnsFalseToken = LazyContract("pytypes.tests.weird.ReturnsFalse", "ReturnsFalseToken")
+TransferFeeToken = LazyContract("pytypes.tests.weird.TransferFee", "TransferFeeToken")
+Uint96ERC20 = LazyContract("pytypes.tests.weird.Uint96", "Uint96ERC20")
+UpgradableToken = LazyContract("pytypes.tests.weird.Upgradable", "Proxy")
+
+SafeTransferLib = LazyContract("pytypes.src.utils.SafeTransferLib", "SafeTransferLib")
 
 
 @default_chain.connect()
@@ -1,93 +1,115 @@
 import random
+from collections import defaultdict
+from typing import DefaultDict, Dict, Set, Tuple
 
 from wake.testing.fuzzing import *
 from wake.testing import *
 
-from pytypes.tests.ERC721Mock import ERC721Mock
+
+from .fuzz_runner import FixtureFuzzTest, run_seeded
+from .gas_profile import GAS_SEED, GasProfile
+from .utils import LazyContract, RandomAccessSet
+
+ERC721Mock = LazyContract("pytypes.tests.ERC721Mock", "ERC721Mock")
 
 
 ###################################################################
 ####################### PYTHON ERC721 MODEL #######################
 ###################################################################
 class ERC721:
-    # mapping owner -> token id
-    owners: dict[int, Address]
-    # mapping owner -> token count
-    balances: dict[Address, int]
-    # mapping token id -> approved address
-    approvals: dict[int, Address]
-    # mapping operator approval owner -> operator
-    operators: dict[Address, Address]
+    # Every collection a flow picks from is a swap-and-pop RandomAccessSet,
+    # so random selection and updates cost O(1) however many tokens exist.
+    __slots__ = ("owners", "tokens", "tokens_of", "approvals", "approved_tokens", "operators", "operator_pairs")
+
+    # mapping token id -> owner
+    owners: Dict[int, Address]
+    # all existing token ids
+    tokens: RandomAccessSet[int]
+    # mapping owner -> owned token ids, the balance is its length
+    tokens_of: DefaultDict[Address, RandomAccessSet[int]]
+    # mapping token id -> approved address, cleared on transfer and burn
+    approvals: Dict[int, Address]
+    # token ids with an approved address
+    approved_tokens: RandomAccessSet[int]
+    # mapping owner -> operators approved for all of the owner's tokens
+    operators: DefaultDict[Address, Set[Address]]
+    # all (owner, operator) pairs in operators
+    operator_pairs: RandomAccessSet[Tuple[Address, Address]]
+
     def __init__(self):
         self.owners = {}
-        self.balances = {}
+        self.tokens = RandomAccessSet()
+        self.tokens_of = defaultdict(RandomAccessSet)
         self.approvals = {}
-        self.operators = {}
+        self.approved_tokens = RandomAccessSet()
+        self.operators = defaultdict(set)
+        self.operator_pairs = RandomAccessSet()
 
-    def balance_of(self, _owner: Address):
-        return self.balances[_owner]
+    def balance_of(self, _owner: Address) -> int:
+        tokens = self.tokens_of.get(_owner)
+        return 0 if tokens is None else len(tokens)
 
-    def owner_of(self, _token_id: uint):
+    def owner_of(self, _token_id: int) -> Address:
         return self.owners[_token_id]
 
-    def safe_transfer_from(_from: Address, _to: Address, _token_id: uint, _data: bytes):
-        return
+    def get_approved(self, _token_id: int) -> Address:
+        return self.approvals.get(_token_id, Address(0))
 
-    def safe_transfer_from(_from: Address, _to: Address, _token_id: uint):
-        return
+    def is_approved_for_all(self, _owner: Address, _operator: Address) -> bool:
+        return _operator in self.operators[_owner]
 
-    def transfer_from(self,_by: Address, _from: Address, _to: Address, _token_id: uint):
-        self.transfer(_by, _from, _to, _token_id)
-
-    def transfer(self, _by: Address, _from: Address, _to: Address, _token_id: uint):
-        if self.owners[_token_id] != _by and self.approvals[_token_id] != _by and self.operators[_from] != _by:
-            return
-        self.balances[_from] -= 1
-        if _to in self.balances.keys():
-            self.balances[_to] += 1
-        else:
-            self.balances[_to] = 1
+    def is_approved_or_owner(self, _by: Address, _token_id: int) -> bool:
+        owner = self.owners[_token_id]
+        return _by == owner or self.get_approved(_token_id) == _by or self.is_approved_for_all(owner, _by)
 
+    def transfer(self, _by: Address, _from: Address, _to: Address, _token_id: int):
+        assert self.owners[_token_id] == _from
+        assert self.is_approved_or_owner(_by, _token_id)
+        self.tokens_of[_from].discard(_token_id)
+        self.tokens_of[_to].add(_token_id)
         self.owners[_token_id] = _to
-        if _token_id in self.approvals.keys():
-            del self.approvals[_token_id]
+        self._clear_approval(_token_id)
 
-    def approve(self, _approved: Address, _token_id: uint):
+    def approve(self, _by: Address, _approved: Address, _token_id: int):
+        owner = self.owners[_token_id]
+        assert _by == owner or self.is_approved_for_all(owner, _by)
         if _approved == Address(0):
-            del self.approvals[_token_id]
-        self.approvals[_token_id] = _approved
-
-    def set_approval_for_all(self, _operator: Address, _owner: Address):
-        self.operators[_owner] = _operator
-
-    def get_approved(self, _token_id: uint):
-        return self.approvals[_token_id]
+            self._clear_approval(_token_id)
+        else:
+            self.approvals[_token_id] = _approved
+            self.approved_tokens.add(_token_id)
 
-    def is_approve_for_all(self, _owner: Address, _operator: Address):
-        if self.operators[_owner]:
-            return True
-        return False
+    def set_approval_for_all(self, _owner: Address, _operator: Address, _approved: bool):
+        if _approved:
+            self.operators[_owner].add(_operator)
+            self.operator_pairs.add((_owner, _operator))
+        else:
+            self.operators[_owner].discard(_operator)
+            self.operator_pairs.discard((_owner, _operator))
 
     def mint(self, _to: Address, _token_id: int):
+        assert _token_id not in self.owners
         self.owners[_token_id] = _to
-        if _to in self.balances.keys():
-            self.balances[_to] += 1
-        else:
-            self.balances[_to] = 1
+        self.tokens.add(_token_id)
+        self.tokens_of[_to].add(_token_id)
 
-    def burn(self,_token_id: int):
-        if _token_id in self.owners.keys():
-            self.balances[self.owner_of(_token_id)] -= 1
-            del self.owners[_token_id]
-            if _token_id in self.approvals.keys():
-                del self.approvals[_token_id]
+    def burn(self, _by: Address, _token_id: int):
+        assert self.is_approved_or_owner(_by, _token_id)
+        owner = self.owners.pop(_token_id)
+        self.tokens.discard(_token_id)
+        self.tokens_of[owner].discard(_token_id)
+        self._clear_approval(_token_id)
+
+    def _clear_approval(self, _token_id: int):
+        self.approvals.pop(_token_id, None)
+        self.approved_tokens.discard(_token_id)
 
 
 ###################################################################
 ########################### Fuzz Test #############################
 ###################################################################
 
-class ERC721FuzzTest(FuzzTest):
+class ERC721FuzzTest(FixtureFuzzTest):
     _erc721: ERC721Mock
     _py_erc721: ERC721
     _id_counter: int
@@ -95,14 +117,28 @@ class ERC721FuzzTest(FuzzTest):
     # We dont want to use random addresses in flows
     # We want more interaction by addresses that are already managing something
     _addresses: List[Address]
+    # Invariants check a fixed-size sample so the cost per step does not grow with
+    # the number of tokens, post_sequence sweeps everything once.
+    INVARIANT_SAMPLE = 32
 
-    def pre_sequence(self) -> None:
+    def deploy_fixtures(self) -> None:
         self._erc721 = ERC721Mock.deploy()
+
+    def pre_sequence(self) -> None:
+        super().pre_sequence()
         self._py_erc721 = ERC721()
         self._addresses = []
         for i in range(20):
             self._addresses.append(random_address())
 
+    def coverage_state(self):
+        # token, approval and operator counts, bucketed by magnitude
+        return (
+            len(self._py_erc721.tokens).bit_length(),
+            len(self._py_erc721.approved_tokens).bit_length(),
+            len(self._py_erc721.operator_pairs).bit_length(),
+        )
+
     ######################## MINT ########################
     @flow(weight=100)
     def mint(self) -> None:
@@ -123,9 +159,10 @@ class ERC721FuzzTest(FuzzTest):
     ######################## BURNS ########################
     @flow(weight=50)
     def burn_owner(self) -> None:
-        if self._py_erc721.owners:
+        if self._py_erc721.tokens:
             # Random token with owner
-            token_id, owner = random.choice(list(self._py_erc721.owners.items()))
+            token_id = self._py_erc721.tokens.choice()
+            owner = self._py_erc721.owner_of(token_id)
             # Burn in contract, msg.sender == owner
             tx = self._erc721.burn(token_id, from_=owner)
             # Check events
@@ -135,32 +172,32 @@ class ERC721FuzzTest(FuzzTest):
             ERC721Mock.AfterTokenTransfer(owner, Address(0), token_id)
             ]
             # Burn in Py model
-            self._py_erc721.burn(token_id)
+            self._py_erc721.burn(owner, token_id)
 
     @flow(weight=40)
     def burn_approved(self) -> None:
-        if self._py_erc721.approvals:
-            # Random token with owner
-            token_id, approved = random.choice(list(self._py_erc721.approvals.items()))
-            if token_id in self._py_erc721.owners.keys():
-                owner = self._py_erc721.owners[token_id]
-                # Burn in contract, msg.sender == approved
-                tx = self._erc721.burn(token_id, from_=approved)
-                # Check events
-                assert tx.events == [
-                ERC721Mock.BeforeTokenTransfer(owner, Address(0), token_id),
-                ERC721Mock.Transfer(owner, Address(0), token_id),
-                ERC721Mock.AfterTokenTransfer(owner, Address(0), token_id)
-                ]
-                # Burn in Py model
-                self._py_erc721.burn(token_id)
+        if self._py_erc721.approved_tokens:
+            # Random token with an approved address
+            token_id = self._py_erc721.approved_tokens.choice()
+            approved = self._py_erc721.get_approved(token_id)
+            owner = self._py_erc721.owner_of(token_id)
+            # Burn in contract, msg.sender == approved
+            tx = self._erc721.burn(token_id, from_=approved)
+            # Check events
+            assert tx.events == [
+            ERC721Mock.BeforeTokenTransfer(owner, Address(0), token_id),
+            ERC721Mock.Transfer(owner, Address(0), token_id),
+            ERC721Mock.AfterTokenTransfer(owner, Address(0), token_id)
+            ]
+            # Burn in Py model
+            self._py_erc721.burn(approved, token_id)
 
     @flow(weight=40)
     def burn_operator(self) -> None:
-        if self._py_erc721.operators:
-            owner, operator = random.choice(list(self._py_erc721.operators.items()))
-            if owner in self._py_erc721.owners.keys():
-                token_id = self._py_erc721.owners[owner]
+        if self._py_erc721.operator_pairs:
+            owner, operator = self._py_erc721.operator_pairs.choice()
+            if self._py_erc721.balance_of(owner) > 0:
+                token_id = self._py_erc721.tokens_of[owner].choice()
                 # Burn in contract, msg.sender == operator
                 tx = self._erc721.burn(token_id, from_=operator)
                 # Check events
@@ -170,14 +207,15 @@ class ERC721FuzzTest(FuzzTest):
                 ERC721Mock.AfterTokenTransfer(owner, Address(0), token_id)
                 ]
                 # Burn in Py model
-                self._py_erc721.burn(token_id)
+                self._py_erc721.burn(operator, token_id)
 
     ######################## TRANSFER ########################
     @flow(weight=80)
     def transfer_owner(self) -> None:
         # from == by == owner
-        if self._py_erc721.owners:
-            token_id, owner = random.choice(list(self._py_erc721.owners.items()))
+        if self._py_erc721.tokens:
+            token_id = self._py_erc721.tokens.choice()
+            owner = self._py_erc721.owner_of(token_id)
             to = random.choice(self._addresses)
             # Transfer in contract, msg.sender == owner
             tx = self._erc721.transfer(owner, to, token_id, from_ = owner)
@@ -192,28 +230,28 @@ class ERC721FuzzTest(FuzzTest):
     @flow(weight=60)
     def transfer_approved(self) -> None:
         # by == approved, from == owner
-        if self._py_erc721.approvals:
-            token_id, approved = random.choice(list(self._py_erc721.approvals.items()))
-            if token_id in self._py_erc721.owners.keys():
-                owner = self._py_erc721.owners[token_id]
-                to = random.choice(self._addresses)
-                # Transfer in contract, msg.sender == approved
-                tx = self._erc721.transfer(owner, to, token_id, from_ = approved)
-                assert tx.events == [
-                    ERC721Mock.BeforeTokenTransfer(owner, to, token_id),
-                    ERC721Mock.Transfer(owner, to, token_id),
-                    ERC721Mock.AfterTokenTransfer(owner, to, token_id)
-                ]
-                # Transfer in Py model
-                self._py_erc721.transfer(approved, owner, to, token_id)
+        if self._py_erc721.approved_tokens:
+            token_id = self._py_erc721.approved_tokens.choice()
+            approved = self._py_erc721.get_approved(token_id)
+            owner = self._py_erc721.owner_of(token_id)
+            to = random.choice(self._addresses)
+            # Transfer in contract, msg.sender == approved
+            tx = self._erc721.transfer(owner, to, token_id, from_ = approved)
+            assert tx.events == [
+                ERC721Mock.BeforeTokenTransfer(owner, to, token_id),
+                ERC721Mock.Transfer(owner, to, token_id),
+                ERC721Mock.AfterTokenTransfer(owner, to, token_id)
+            ]
+            # Transfer in Py model
+            self._py_erc721.transfer(approved, owner, to, token_id)
 
     @flow(weight=60)
     def transfer_operator(self) -> None:
         # by == operator, from == owner
-        if self._py_erc721.operators:
-            owner, operator = random.choice(list(self._py_erc721.operators.items()))
-            if owner in self._py_erc721.owners.keys():
-                token_id = self._py_erc721.owners[owner]
+        if self._py_erc721.operator_pairs:
+            owner, operator = self._py_erc721.operator_pairs.choice()
+            if self._py_erc721.balance_of(owner) > 0:
+                token_id = self._py_erc721.tokens_of[owner].choice()
                 to = random.choice(self._addresses)
                 # Transfer in contract, msg.sender == operator
                 tx = self._erc721.transfer(owner, to, token_id, from_ = operator)
@@ -229,8 +267,9 @@ class ERC721FuzzTest(FuzzTest):
     @flow(weight=80)
     def transfer_from_owner(self) -> None:
         # from == by == owner
-        if self._py_erc721.owners:
-            token_id, owner = random.choice(list(self._py_erc721.owners.items()))
+        if self._py_erc721.tokens:
+            token_id = self._py_erc721.tokens.choice()
+            owner = self._py_erc721.owner_of(token_id)
             to = random.choice(self._addresses)
             # Transfer in contract, msg.sender == owner
             tx = self._erc721.transferFrom(owner, to, token_id, from_ = owner)
@@ -240,33 +279,33 @@ class ERC721FuzzTest(FuzzTest):
                 ERC721Mock.AfterTokenTransfer(owner, to, token_id)
                 ]
             # Transfer in Py model
-            self._py_erc721.transfer_from(owner, owner, to, token_id)
+            self._py_erc721.transfer(owner, owner, to, token_id)
 
     @flow(weight=60)
     def transfer_from_approved(self) -> None:
         # by == approved, from == owner
-        if self._py_erc721.approvals:
-            token_id, approved = random.choice(list(self._py_erc721.approvals.items()))
-            if token_id in self._py_erc721.owners.keys():
-                owner = self._py_erc721.owners[token_id]
-                to = random.choice(self._addresses)
-                # Transfer in contract, msg.sender == approved
-                tx = self._erc721.transferFrom(owner, to, token_id, from_ = approved)
-                assert tx.events == [
-                    ERC721Mock.BeforeTokenTransfer(owner, to, token_id),
-                    ERC721Mock.Transfer(owner, to, token_id),
-                    ERC721Mock.AfterTokenTransfer(owner, to, token_id)
-                ]
-                # Transfer in Py model
-                self._py_erc721.transfer_from(approved, owner, to, token_id)
+        if self._py_erc721.approved_tokens:
+            token_id = self._py_erc721.approved_tokens.choice()
+            approved = self._py_erc721.get_approved(token_id)
+            owner = self._py_erc721.owner_of(token_id)
+            to = random.choice(self._addresses)
+            # Transfer in contract, msg.sender == approved
+            tx = self._erc721.transferFrom(owner, to, token_id, from_ = approved)
+            assert tx.events == [
+                ERC721Mock.BeforeTokenTransfer(owner, to, token_id),
+                ERC721Mock.Transfer(owner, to, token_id),
+                ERC721Mock.AfterTokenTransfer(owner, to, token_id)
+            ]
+            # Transfer in Py model
+            self._py_erc721.transfer(approved, owner, to, token_id)
 
     @flow(weight=60)
     def transfer_from_operator(self) -> None:
         # by == operator, from == owner
-        if self._py_erc721.operators:
-            owner, operator = random.choice(list(self._py_erc721.operators.items()))
-            if owner in self._py_erc721.owners.keys():
-                token_id = self._py_erc721.owners[owner]
+        if self._py_erc721.operator_pairs:
+            owner, operator = self._py_erc721.operator_pairs.choice()
+            if self._py_erc721.balance_of(owner) > 0:
+                token_id = self._py_erc721.tokens_of[owner].choice()
                 to = random.choice(self._addresses)
                 # Transfer in contract, msg.sender == operator
                 tx = self._erc721.transferFrom(owner, to, token_id, from_ = operator)
@@ -276,13 +315,14 @@ class ERC721FuzzTest(FuzzTest):
                     ERC721Mock.AfterTokenTransfer(owner, to, token_id)
                 ]
                 # Transfer in Py model
-                self._py_erc721.transfer_from(operator, owner, to, token_id)
+                self._py_erc721.transfer(operator, owner, to, token_id)
 
     ######################## APPROVALS ########################
     @flow(weight=50)
     def approve_owner(self) -> None:
-        if self._py_erc721.owners:
-            token_id, owner = random.choice(list(self._py_erc721.owners.items()))
+        if self._py_erc721.tokens:
+            token_id = self._py_erc721.tokens.choice()
+            owner = self._py_erc721.owner_of(token_id)
             account = random.choice(self._addresses)
             # Approve in contract
             tx = self._erc721.approve(account, token_id, from_=owner)
@@ -292,28 +332,28 @@ class ERC721FuzzTest(FuzzTest):
 
                 ]
             # Approve in Py model
-            self._py_erc721.approve(account, token_id)
+            self._py_erc721.approve(owner, account, token_id)
 
     @flow(weight=40)
     def dis_approve_owner(self) -> None:
-        if self._py_erc721.owners:
-            token_id, owner = random.choice(list(self._py_erc721.owners.items()))
-            if token_id in self._py_erc721.approvals.keys():
-                # Delete approval in contract
-                tx = self._erc721.approve(Address(0), token_id, from_=owner)
-                # Check events
-                assert tx.events == [
-                    ERC721Mock.Approval(owner, Address(0), token_id),
-                ]
-                # Delete approval in Py model
-                self._py_erc721.approve(Address(0), token_id)
+        if self._py_erc721.approved_tokens:
+            token_id = self._py_erc721.approved_tokens.choice()
+            owner = self._py_erc721.owner_of(token_id)
+            # Delete approval in contract
+            tx = self._erc721.approve(Address(0), token_id, from_=owner)
+            # Check events
+            assert tx.events == [
+                ERC721Mock.Approval(owner, Address(0), token_id),
+            ]
+            # Delete approval in Py model
+            self._py_erc721.approve(owner, Address(0), token_id)
 
     @flow(weight=40)
     def approve_operator(self) -> None:
-        if self._py_erc721.operators:
-            owner, operator = random.choice(list(self._py_erc721.operators.items()))
-            if owner in self._py_erc721.owners.keys():
-                token_id = self._py_erc721.owners[owner]
+        if self._py_erc721.operator_pairs:
+            owner, operator = self._py_erc721.operator_pairs.choice()
+            if self._py_erc721.balance_of(owner) > 0:
+                token_id = self._py_erc721.tokens_of[owner].choice()
                 account = random.choice(self._addresses)
                 # Approve in contract
                 tx = self._erc721.approve(account, token_id, from_=operator)
@@ -322,13 +362,13 @@ class ERC721FuzzTest(FuzzTest):
                     ERC721Mock.Approval(owner, account, token_id),
                 ]
                 # Approve in Py model
-                self._py_erc721.approve(account, token_id)
+                self._py_erc721.approve(operator, account, token_id)
 
     #################### APPROVE FOR ALL ########################
     @flow(weight=40)
     def approve_for_all(self) -> None:
-        if self._py_erc721.owners:
-            _, owner = random.choice(list(self._py_erc721.owners.items()))
+        if self._py_erc721.tokens:
+            owner = self._py_erc721.owner_of(self._py_erc721.tokens.choice())
             operator = random.choice(self._addresses)
             # Set approve for all in contract
             tx = self._erc721.setApprovalForAll(operator, True, from_=owner)
@@ -336,29 +376,57 @@ class ERC721FuzzTest(FuzzTest):
                 ERC721Mock.ApprovalForAll(owner, operator, True),
             ]
             # Set approve for all in Py model
-            self._py_erc721.set_approval_for_all(operator, owner)
+            self._py_erc721.set_approval_for_all(owner, operator, True)
+
+    @flow(weight=20)
+    def revoke_approval_for_all(self) -> None:
+        if self._py_erc721.operator_pairs:
+            owner, operator = self._py_erc721.operator_pairs.choice()
+            # Revoke approve for all in contract
+            tx = self._erc721.setApprovalForAll(operator, False, from_=owner)
+            assert tx.events == [
+                ERC721Mock.ApprovalForAll(owner, operator, False),
+            ]
+            # Revoke approve for all in Py model
+            self._py_erc721.set_approval_for_all(owner, operator, False)
+
+    def post_sequence(self) -> None:
+        super().post_sequence()
+        self._check_tokens(self._py_erc721.tokens)
+        self._check_operators(self._py_erc721.operator_pairs)
 
+    def _check_tokens(self, token_ids) -> None:
+        for token_id in token_ids:
+            assert self._erc721.ownerOf(token_id) == self._py_erc721.owner_of(token_id)
+            assert self._erc721.getApproved(token_id) == self._py_erc721.get_approved(token_id)
+
+    def _check_operators(self, pairs) -> None:
+        for owner, operator in pairs:
+            assert self._erc721.isApprovedForAll(owner, operator)
 
     @invariant(period=20)
     def invariant_owners(self) -> None:
-        owners = self._py_erc721.owners.items()
-        for token_id, owner in owners:
-            assert self._erc721.ownerOf(token_id) == owner
+        self._check_tokens(self._py_erc721.tokens.sample(self.INVARIANT_SAMPLE))
 
     @invariant(period=20)
     def invariant_balances(self) -> None:
-        balances = self._py_erc721.balances.items()
-        for owner, count in balances:
-            assert self._erc721.balanceOf(owner) == count
+        for owner in self._addresses:
+            assert self._erc721.balanceOf(owner) == self._py_erc721.balance_of(owner)
 
     @invariant(period=20)
-    def invariant_approvals(self) -> None:
-        approvals = self._py_erc721.approvals.items()
-        for token_id, approved in approvals:
-            assert self._erc721.getApproved(token_id) == approved
+    def invariant_operators(self) -> None:
+        self._check_operators(self._py_erc721.operator_pairs.sample(self.INVARIANT_SAMPLE))
 
 
 @default_chain.connect()
 def test_eip712_fuzz():
-    ERC721FuzzTest().run(30, 600)
+    run_seeded(ERC721FuzzTest, 30, 600)
+
+
+@default_chain.connect()
+def test_erc721_gas():
+    # same campaign size as the fuzz test, from the seed the committed baseline was recorded with
+    with GasProfile() as gas:
+        run_seeded(ERC721FuzzTest, 30, 600, seed=GAS_SEED)
+    gas.finish("erc721")
 
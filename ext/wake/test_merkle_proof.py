@@ -1,10 +1,14 @@
+import json
+import os
 import random
+import tempfile
 
 from wake.testing import *
 from wake.testing.fuzzing import random_bytes, random_int
-from pytypes.tests.MerkleProofMock import MerkleProofMock
 
-from .utils import MerkleTree
+from .utils import FlatMerkleTree, LazyContract, MerkleTree, ProofCache, read_exported_proof
+
+MerkleProofMock = LazyContract("pytypes.tests.MerkleProofMock", "MerkleProofMock")
 
 
 @default_chain.connect()
@@ -49,3 +53,127 @@ def test_merkle_multiproof():
         proof, flags = tree.get_multiproof(indexes)
         assert merkle_proof_mock.verifyMultiProof(proof, tree.root, [keccak256(leaf) for leaf in leaves], flags)
         assert merkle_proof_mock.verifyMultiProofCalldata(proof, tree.root, [keccak256(leaf) for leaf in leaves], flags)
+
+
+@default_chain.connect()
+def test_merkle_incremental():
+    tree = MerkleTree()
+    leaves = []
+    merkle_proof_mock = MerkleProofMock.deploy()
+
+    for _ in range(200):
+        leaf = random_bytes(0, 100)
+        leaves.append(leaf)
+        tree.add_leaf(leaf)
+
+        index = random_int(0, len(leaves) - 1)
+        if random.random() < 0.2:
+            leaves[index] = random_bytes(0, 100)
+            tree.set_leaf(index, leaves[index])
+
+        rebuilt = MerkleTree()
+        for l in leaves:
+            rebuilt.add_leaf(l)
+        assert tree.root == rebuilt.root
+        assert tree.get_proof(index) == rebuilt.get_proof(index)
+        assert merkle_proof_mock.verify(tree.get_proof(index), tree.root, keccak256(leaves[index]))
+
+
+@default_chain.connect()
+def test_merkle_multiproof_large():
+    tree = MerkleTree()
+    for _ in range(10_000):
+        tree.add_leaf(random_bytes(0, 100))
+
+    merkle_proof_mock = MerkleProofMock.deploy()
+
+    for _ in range(5):
+        indexes = sorted(random.sample(range(len(tree.values)), random_int(1_000, 2_000)))
+        leaf_hashes = [keccak256(tree.values[i]) for i in indexes]
+        proof, flags = tree.get_multiproof(indexes)
+        assert merkle_proof_mock.verifyMultiProof(proof, tree.root, leaf_hashes, flags)
+        assert merkle_proof_mock.verifyMultiProofCalldata(proof, tree.root, leaf_hashes, flags)
+
+
+@default_chain.connect()
+def test_merkle_flat():
+    tree = MerkleTree()
+    for _ in range(1_000):
+        tree.add_leaf(random_bytes(0, 100))
+
+    merkle_proof_mock = MerkleProofMock.deploy()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.bin")
+        FlatMerkleTree.build(tree.values).save(path)
+        flat_tree = FlatMerkleTree.load(path)
+
+        assert len(flat_tree) == len(tree.values)
+        assert flat_tree.root == tree.root
+        for i in random.sample(range(len(tree.values)), 100):
+            assert flat_tree.get_leaf_hash(i) == keccak256(tree.values[i])
+            assert flat_tree.get_proof(i) == tree.get_proof(i)
+            assert merkle_proof_mock.verify(flat_tree.get_proof(i), flat_tree.root, flat_tree.get_leaf_hash(i))
+
+        indexes = sorted(random.sample(range(len(tree.values)), random_int(1, 100)))
+        proof, flags = flat_tree.get_multiproof(indexes)
+        assert (proof, flags) == tree.get_multiproof(indexes)
+        assert merkle_proof_mock.verifyMultiProof(proof, flat_tree.root, [flat_tree.get_leaf_hash(i) for i in indexes], flags)
+
+        flat_tree.close()
+
+
+@default_chain.connect()
+def test_merkle_proof_export():
+    tree = MerkleTree()
+    for _ in range(1_000):
+        tree.add_leaf(random_bytes(0, 100))
+
+    merkle_proof_mock = MerkleProofMock.deploy()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tree.export_proofs(os.path.join(tmp, "proofs.bin"))
+        tree.export_proofs(os.path.join(tmp, "proofs.jsonl"), "jsonl")
+
+        with open(os.path.join(tmp, "proofs.jsonl")) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == len(tree.values)
+
+        for i in random.sample(range(len(tree.values)), 100):
+            root, proof = read_exported_proof(os.path.join(tmp, "proofs.bin"), i)
+            assert root == tree.root
+            assert proof == tree.get_proof(i)
+            assert lines[i]["index"] == i
+            assert [bytes.fromhex(node[2:]) for node in lines[i]["proof"]] == proof
+            assert merkle_proof_mock.verify(proof, root, keccak256(tree.values[i]))
+
+
+def test_merkle_proof_cache():
+    tree = MerkleTree()
+    for _ in range(100):
+        tree.add_leaf(random_bytes(0, 100))
+
+    cache = ProofCache(tree, maxsize=10)
+    for i in range(10):
+        assert cache.get_proof(i) == tree.get_proof(i)
+    assert cache.hits == 0 and cache.misses == 10
+
+    for i in range(10):
+        proof = cache.get_proof(i)
+        assert proof == tree.get_proof(i)
+        proof.append(random_bytes(32))
+    assert cache.hits == 10 and cache.misses == 10
+
+    assert cache.get_multiproof([1, 2, 3]) == tree.get_multiproof([1, 2, 3])
+    assert cache.get_multiproof([1, 2, 3]) == tree.get_multiproof([1, 2, 3])
+    assert cache.hits == 11 and cache.misses == 11
+    assert len(cache) == 10
+
+    # the least recently used proof was evicted
+    cache.get_proof(0)
+    assert cache.misses == 12
+
+    # a new root invalidates all entries
+    tree.add_leaf(random_bytes(0, 100))
+    assert cache.get_proof(1) == tree.get_proof(1)
+    assert cache.misses == 13 and len(cache) == 1
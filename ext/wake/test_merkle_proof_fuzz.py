@@ -2,12 +2,17 @@ import random
 
 from wake.testing import *
 from wake.testing.fuzzing import *
-from pytypes.tests.MerkleProofMock import MerkleProofMock
 
-from .utils import MerkleTree
+from .fuzz_runner import run_sharded
+from .utils import LazyContract, MerkleTree, verify_multiproof, verify_multiproofs, verify_proof, verify_proofs
+
+MerkleProofMock = LazyContract("pytypes.tests.MerkleProofMock", "MerkleProofMock")
 
 
 class MerkleProofFuzzTest(FuzzTest):
+    # Every check runs against the offline verifier, this fraction of them is also diffed against MerkleProofMock.
+    ONCHAIN_SAMPLE_RATE = 0.1
+
     _merkle_proof: MerkleProofMock
     _tree: MerkleTree
 
@@ -19,14 +24,27 @@ class MerkleProofFuzzTest(FuzzTest):
         for _ in range(random_int(1, 1_000)):
             self._tree.add_leaf(random_bytes(0, 100))
 
+    def _verify(self, proof: List[bytes], root: bytes, leaf_hash: bytes) -> bool:
+        valid = verify_proof(proof, root, leaf_hash)
+        if random.random() < self.ONCHAIN_SAMPLE_RATE:
+            assert self._merkle_proof.verify(proof, root, leaf_hash) == valid
+            assert self._merkle_proof.verifyCalldata(proof, root, leaf_hash) == valid
+        return valid
+
+    def _verify_multiproof(self, proof: List[bytes], root: bytes, leaf_hashes: List[bytes], flags: List[bool]) -> bool:
+        valid = verify_multiproof(proof, root, leaf_hashes, flags)
+        if random.random() < self.ONCHAIN_SAMPLE_RATE:
+            assert self._merkle_proof.verifyMultiProof(proof, root, leaf_hashes, flags) == valid
+            assert self._merkle_proof.verifyMultiProofCalldata(proof, root, leaf_hashes, flags) == valid
+        return valid
+
     @flow()
     def flow_verify(self) -> None:
         index = random_int(0, len(self._tree.values) - 1)
         proof = self._tree.get_proof(index)
         leaf = self._tree.values[index]
 
-        assert self._merkle_proof.verify(proof, self._tree.root, keccak256(leaf))
-        assert self._merkle_proof.verifyCalldata(proof, self._tree.root, keccak256(leaf))
+        assert self._verify(proof, self._tree.root, keccak256(leaf))
 
     @flow(weight=40)
     def flow_verify_invalid_random(self, proof: List[bytes32], root: bytes32, leaf: bytes) -> None:
@@ -38,9 +56,7 @@ class MerkleProofFuzzTest(FuzzTest):
         except Exception:
             pass
 
-        leaf_hash = keccak256(leaf)
-        assert not self._merkle_proof.verify(proof, root, leaf_hash)
-        assert not self._merkle_proof.verifyCalldata(proof, root, leaf_hash)
+        assert not self._verify(proof, root, keccak256(leaf))
 
     @flow(weight=60)
     def flow_verify_invalid_modified(self) -> None:
@@ -60,8 +76,7 @@ class MerkleProofFuzzTest(FuzzTest):
         else:
             root = random_bytes(32)
 
-        assert not self._merkle_proof.verify(proof, root, keccak256(leaf))
-        assert not self._merkle_proof.verifyCalldata(proof, root, keccak256(leaf))
+        assert not self._verify(proof, root, keccak256(leaf))
 
     @flow()
     def flow_verify_multiproof(self) -> None:
@@ -69,8 +84,7 @@ class MerkleProofFuzzTest(FuzzTest):
         leaves = [self._tree.values[i] for i in indexes]
         proof, flags = self._tree.get_multiproof(indexes)
 
-        assert self._merkle_proof.verifyMultiProof(proof, self._tree.root, [keccak256(leaf) for leaf in leaves], flags)
-        assert self._merkle_proof.verifyMultiProofCalldata(proof, self._tree.root, [keccak256(leaf) for leaf in leaves], flags)
+        assert self._verify_multiproof(proof, self._tree.root, [keccak256(leaf) for leaf in leaves], flags)
 
     @flow(weight=40)
     def flow_verify_multiproof_invalid_random(self, proof: List[bytes32], root: bytes32, leaves: List[bytes], flags: List[bool]) -> None:
@@ -82,9 +96,7 @@ class MerkleProofFuzzTest(FuzzTest):
         except Exception:
             pass
 
-        leaf_hashes = [keccak256(leaf) for leaf in leaves]
-        assert not self._merkle_proof.verifyMultiProof(proof, root, leaf_hashes, flags)
-        assert not self._merkle_proof.verifyMultiProofCalldata(proof, root, leaf_hashes, flags)
+        assert not self._verify_multiproof(proof, root, [keccak256(leaf) for leaf in leaves], flags)
 
     @flow(weight=60)
     def flow_verify_multiproof_invalid_modified(self) -> None:
@@ -113,11 +125,47 @@ class MerkleProofFuzzTest(FuzzTest):
         else:
             root = random_bytes(32)
 
-        leaf_hashes = [keccak256(leaf) for leaf in leaves]
-        assert not self._merkle_proof.verifyMultiProof(proof, root, leaf_hashes, flags)
-        assert not self._merkle_proof.verifyMultiProofCalldata(proof, root, leaf_hashes, flags)
+        assert not self._verify_multiproof(proof, root, [keccak256(leaf) for leaf in leaves], flags)
+
+    @flow(weight=20)
+    def flow_verify_batch(self) -> None:
+        # thousands of valid and modified proofs checked offline at once, a few of them are spot-checked on chain
+        leaves = self._tree.values
+        items = []
+        expected = []
+        for _ in range(1_000):
+            index = random_int(0, len(leaves) - 1)
+            proof = self._tree.get_proof(index)
+            leaf_hash = keccak256(leaves[index])
+            valid = random.random() < 0.5
+            if not valid:
+                if len(proof) != 0 and random.random() < 0.5:
+                    proof[random_int(0, len(proof) - 1)] = random_bytes(32)
+                else:
+                    leaf_hash = random_bytes(32)
+            items.append((proof, self._tree.root, leaf_hash))
+            expected.append(valid)
+
+        assert verify_proofs(items) == expected
+        for i in random.sample(range(len(items)), 5):
+            assert self._merkle_proof.verify(*items[i]) == expected[i]
+            assert self._merkle_proof.verifyCalldata(*items[i]) == expected[i]
+
+    @flow(weight=20)
+    def flow_verify_multiproof_batch(self) -> None:
+        leaves = self._tree.values
+        items = []
+        for _ in range(100):
+            indexes = sorted(random.sample(range(len(leaves)), random_int(1, len(leaves))))
+            proof, flags = self._tree.get_multiproof(indexes)
+            items.append((proof, self._tree.root, [keccak256(leaves[i]) for i in indexes], flags))
+
+        assert all(verify_multiproofs(items))
+        for i in random.sample(range(len(items)), 2):
+            assert self._merkle_proof.verifyMultiProof(*items[i])
+            assert self._merkle_proof.verifyMultiProofCalldata(*items[i])
 
 
-@default_chain.connect()
 def test_merkle_proof_fuzz():
-    MerkleProofFuzzTest().run(10, 100)
+    # Sharded across worker processes, each with its own anvil.
+    run_sharded(MerkleProofFuzzTest, 10, 1_000)
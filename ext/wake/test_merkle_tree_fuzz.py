@@ -0,0 +1,82 @@
+import random
+
+from wake.testing import *
+from wake.testing.fuzzing import *
+
+from .fuzz_runner import FixtureFuzzTest
+from .utils import CompleteMerkleTree, LazyContract, hash_pair, pad_leaves
+
+MerkleTreeLib = LazyContract("pytypes.src.utils.MerkleTreeLib", "MerkleTreeLib")
+MerkleTreeLibMock = LazyContract("pytypes.tests.MerkleTreeLibMock", "MerkleTreeLibMock")
+
+
+class MerkleTreeLibFuzzTest(FixtureFuzzTest):
+    _merkle_tree: MerkleTreeLibMock
+    _leaves: List[bytes]
+    _tree: CompleteMerkleTree
+
+    def deploy_fixtures(self) -> None:
+        self._merkle_tree = MerkleTreeLibMock.deploy()
+
+    def pre_sequence(self) -> None:
+        super().pre_sequence()
+        self._leaves = [random_bytes(32) for _ in range(random_int(1, 1_000, edge_values_prob=0.1))]
+        self._tree = CompleteMerkleTree.build(self._leaves)
+
+        assert self._merkle_tree.build(self._leaves) == self._tree.nodes
+        assert self._merkle_tree.root(self._tree.nodes) == self._tree.root
+
+    @flow()
+    def flow_build_random_size(self) -> None:
+        leaves = [random_bytes(32) for _ in range(random_int(1, 300, edge_values_prob=0.1))]
+        tree = CompleteMerkleTree.build(leaves)
+        assert self._merkle_tree.build(leaves) == tree.nodes
+
+    @flow()
+    def flow_leaf(self) -> None:
+        index = random_int(0, len(self._leaves) - 1)
+        assert self._merkle_tree.leaf(self._tree.nodes, index) == self._tree.leaf(index) == self._leaves[index]
+
+    @flow(weight=200)
+    def flow_leaf_proof(self) -> None:
+        index = random_int(0, len(self._leaves) - 1)
+        proof = self._tree.leaf_proof(index)
+        assert self._merkle_tree.leafProof(self._tree.nodes, index) == proof
+
+        node = self._leaves[index]
+        for sibling in proof:
+            node = hash_pair(node, sibling)
+        assert node == self._tree.root
+
+    @flow()
+    def flow_node_proof(self) -> None:
+        index = random_int(0, len(self._tree.nodes) - 1)
+        assert self._merkle_tree.nodeProof(self._tree.nodes, index) == self._tree.node_proof(index)
+
+    @flow(weight=200)
+    def flow_multi_proof(self) -> None:
+        indices = sorted(random.sample(range(len(self._leaves)), random_int(1, len(self._leaves))))
+        assert self._merkle_tree.multiProofForLeaves(self._tree.nodes, indices) == self._tree.multi_proof_for_leaves(indices)
+
+    @flow(weight=20)
+    def flow_out_of_bounds(self) -> None:
+        leaf_index = random_int(len(self._leaves), 2 ** 256 - 1, edge_values_prob=0.2)
+        node_index = random_int(len(self._tree.nodes), 2 ** 256 - 1, edge_values_prob=0.2)
+
+        with must_revert(UnknownTransactionRevertedError(MerkleTreeLib.MerkleTreeOutOfBoundsAccess.selector)):
+            self._merkle_tree.leafProof(self._tree.nodes, leaf_index)
+        with must_revert(UnknownTransactionRevertedError(MerkleTreeLib.MerkleTreeOutOfBoundsAccess.selector)):
+            self._merkle_tree.nodeProof(self._tree.nodes, node_index)
+        with must_revert(UnknownTransactionRevertedError(MerkleTreeLib.MerkleTreeOutOfBoundsAccess.selector)):
+            self._merkle_tree.multiProofForLeaves(self._tree.nodes, [leaf_index])
+
+    @flow(weight=20)
+    def flow_pad(self) -> None:
+        leaves = self._leaves[:random_int(1, len(self._leaves))]
+        default_fill = random_bytes(32)
+        assert self._merkle_tree.pad(leaves, default_fill) == pad_leaves(leaves, default_fill)
+
+
+@default_chain.connect()
+def test_merkle_tree_fuzz():
+    MerkleTreeLibFuzzTest.run(10, 100)
@@ -0,0 +1,65 @@
+import os
+import statistics
+from typing import Dict, List, Tuple
+
+from wake.testing import *
+
+from .p256_reference import batched, read_vectors, verify_batch
+from .utils import LazyContract, format_table, use_path, verifier_bytecode
+
+P256Mock = LazyContract("pytypes.tests.P256Mock", "P256Mock")
+
+WYCHEPROOF = os.path.join("test", "data", "wycheproof.jsonl")
+# vectors per verifySignatures call
+BATCH = 32
+# vectors per outcome measured with verifySignatureGas
+GAS_SAMPLES = 16
+
+def _columns(batch: List[dict]) -> Tuple[List[bytes], ...]:
+    return (
+        [v["hash"] for v in batch],
+        *([v[key].to_bytes(32, "big") for v in batch] for key in ("r", "s", "x", "y")),
+    )
+
+
+@default_chain.connect()
+def test_p256_wycheproof():
+    mock = P256Mock.deploy()
+    # a staticcall to the empty precompile address returns no data, checked before anything is etched there
+    native_precompile = mock.hasPrecompile()
+    bytecode = verifier_bytecode()
+    # a native precompile cannot be removed, so the fallback is only reachable without one
+    paths = ["precompile"] if native_precompile else ["precompile", "verifier"]
+    # Without a native precompile both paths run the same etched bytecode, so gas is only measured once,
+    # on the verifier fallback. Comparing the precompile against the verifier needs a node with RIP-7212.
+    gas_path = "precompile" if native_precompile else "verifier"
+
+    gas: Dict[bool, List[int]] = {True: [], False: []}
+    for path in paths:
+        use_path(path, native_precompile, bytecode)
+        assert mock.hasPrecompileOrVerifier()
+
+        for batch in batched(read_vectors(WYCHEPROOF), BATCH):
+            columns = _columns(batch)
+            for allow_malleability in (True, False):
+                expected = verify_batch(batch, allow_malleability)
+                results = mock.verifySignatures(*columns, allow_malleability)
+                for vector, result, e in zip(batch, results, expected):
+                    if allow_malleability:
+                        # the vectors' expectations are for the malleable verifier
+                        assert e == vector["valid"], f"reference: {vector['comment']}"
+                    assert result == e, f"{path}, allowMalleability={allow_malleability}: {vector['comment']}"
+
+            if path != gas_path:
+                continue
+            for column in zip(*columns):
+                if min(len(samples) for samples in gas.values()) >= GAS_SAMPLES:
+                    break
+                valid, gas_used = mock.verifySignatureGas(*column)
+                if len(gas[valid]) < GAS_SAMPLES:
+                    gas[valid].append(gas_used)
+
+    label = "RIP-7212 precompile" if native_precompile else "etched verifier"
+    rows = [(label, *(statistics.median_low(gas[valid]) if gas[valid] else "-" for valid in (True, False)))]
+    print()
+    print(format_table(("path", "valid gas", "invalid gas"), rows))
@@ -1,32 +1,116 @@
+from typing import Optional
+
 from wake.testing import *
 from wake.testing.fuzzing import *
-from pytypes.tests.SignatureCheckerMock import SignatureCheckerMock, ERC1271SignatureChecker
 
-class SignatureCheckerFuzzTest(FuzzTest):
+from . import ecdsa_reference
+from .ecdsa_reference import HALF_N_PLUS_1, INVALID_SIGNATURE, N, ZERO_ADDRESS, is_valid_signature_batch
+from .fuzz_runner import FixtureFuzzTest
+from .signature_pool import SignaturePool, SignedHash
+from .utils import LazyContract
+
+SignatureCheckerMock = LazyContract("pytypes.tests.SignatureCheckerMock", "SignatureCheckerMock")
+ERC1271SignatureChecker = LazyContract("pytypes.tests.SignatureCheckerMock", "ERC1271SignatureChecker")
+ECDSAMock = LazyContract("pytypes.tests.ECDSAMock", "ECDSAMock")
+
+
+def malleate(signed: SignedHash) -> bytes:
+    # One edge-case or malleated variant of a valid signature, valid or not.
+    r = int.from_bytes(signed.r, "big")
+    s = int.from_bytes(signed.s, "big")
+    x = random_int(0, 9)
+    if x == 0:
+        return signed.r + signed.vs
+    elif x == 1:
+        # high-s twin, valid with the flipped v
+        return signed.r + (N - s).to_bytes(32, "big") + bytes([55 - signed.v if random_bool() else signed.v])
+    elif x == 2:
+        return signed.signature[:64] + bytes([random.choice([0, 1, 29, random_int(0, 255)])])
+    elif x == 3:
+        r = random.choice([0, N, r + N if r < 2**256 - N else 2**256 - 1])
+        return r.to_bytes(32, "big") + signed.signature[32:]
+    elif x == 4:
+        s = random.choice([0, N, HALF_N_PLUS_1, HALF_N_PLUS_1 - 1])
+        return signed.r + s.to_bytes(32, "big") + bytes([signed.v])
+    elif x == 5:
+        # compact form with the wrong parity
+        return signed.r + bytes([signed.vs[0] ^ 0x80]) + signed.vs[1:]
+    elif x == 6:
+        signature = bytearray(random.choice([signed.signature, signed.r + signed.vs]))
+        pos = random_int(0, len(signature) * 8 - 1)
+        signature[pos // 8] ^= 1 << (pos % 8)
+        return bytes(signature)
+    elif x == 7:
+        return random.choice([signed.signature[:random_int(0, 63)], signed.signature + random_bytes(1, 32)])
+    elif x == 8:
+        return random_bytes(random.choice([64, 65]))
+    else:
+        return signed.signature
+
+
+def invalid_length(signed: SignedHash) -> bytes:
+    # A signature of any length but 64 and 65, for the uniquely corrupt canonical hash.
+    length = random.choice([0, 1, 32, 63, 66, 96, random_int(0, 200)])
+    while length in (64, 65):
+        length = random_int(0, 200)
+    return (signed.signature * 4)[:length]
+
+
+class SignatureCheckerFuzzTest(FixtureFuzzTest):
+    # Variants checked offline per flow_check_signature_malleated, and how many of them are also checked on-chain.
+    MALLEATED_BATCH = 32
+    ONCHAIN_SAMPLE = 2
+    # Variants diffed against every ECDSA.sol function per flow_ecdsa_differential.
+    ECDSA_VARIANTS = 4
+    # Size of the (at most one per sequence) batch recovered offline and with a single tryRecoverBatch call,
+    # above ecdsa_reference.PARALLEL_THRESHOLD so it goes through the process pool.
+    RECOVER_BATCH = 2 * ecdsa_reference.PARALLEL_THRESHOLD
+
     _signature_checker: SignatureCheckerMock
     _erc1271_signature_checker: ERC1271SignatureChecker
+    _ecdsa: ECDSAMock
     _signer: Account
+    _signatures: Optional[SignaturePool] = None
 
-    def pre_sequence(self) -> None:
+    def deploy_fixtures(self) -> None:
         self._signature_checker = SignatureCheckerMock.deploy()
         self._erc1271_signature_checker = ERC1271SignatureChecker.deploy()
+        self._ecdsa = ECDSAMock.deploy()
+
+    def pre_sequence(self) -> None:
+        super().pre_sequence()
         self._signer = Account.new()
+        self._close_pool()
+        self._signatures = SignaturePool(self._signer.private_key, random_int(0, 2**64 - 1))
+
+    def post_sequence(self) -> None:
+        try:
+            super().post_sequence()
+        finally:
+            self._close_pool()
+
+    def _close_pool(self) -> None:
+        # the pool signs ahead in worker processes, stop it once the sequence is over. One left open by a
+        # sequence that raised is closed by the next pre_sequence, or at exit by signature_pool.
+        if self._signatures is not None:
+            self._signatures.close()
+            self._signatures = None
 
     @flow()
     def flow_check_signature(self) -> None:
-        data = random_bytes(0, 1000)
-        hash = keccak256(data)
-        signature = self._signer.sign_hash(hash)
-        r = signature[:32]
-        s = signature[32:64]
-        v = signature[64]
+        signed = self._signatures.get()
+        hash = signed.hash
+        signature = signed.signature
+        r = signed.r
+        s = signed.s
+        v = signed.v
 
         assert self._signature_checker.isValidSignatureNow(self._signer, hash, signature)
         assert self._signature_checker.isValidSignatureNow_(
             self._signer,
             hash,
             r,
-            s if v == 27 else (s[0] | 0x80).to_bytes(1, "big") + s[1:],
+            signed.vs,
         )
         assert self._signature_checker.isValidSignatureNow__(self._signer, hash, v, r, s)
         assert self._signature_checker.isValidSignatureNowCalldata(self._signer, hash, signature)
@@ -37,7 +121,7 @@ class SignatureCheckerFuzzTest(FuzzTest):
             self._erc1271_signature_checker,
             hash,
             r,
-            s if v == 27 else (s[0] | 0x80).to_bytes(1, "big") + s[1:],
+            signed.vs,
             from_=self._signer,
         )
         assert self._signature_checker.isValidSignatureNow__(self._erc1271_signature_checker, hash, v, r, s, from_=self._signer)
@@ -48,7 +132,7 @@ class SignatureCheckerFuzzTest(FuzzTest):
             self._erc1271_signature_checker,
             hash,
             r,
-            s if v == 27 else (s[0] | 0x80).to_bytes(1, "big") + s[1:],
+            signed.vs,
         )
         assert not self._signature_checker.isValidSignatureNow__(self._erc1271_signature_checker, hash, v, r, s)
         assert not self._signature_checker.isValidSignatureNowCalldata(self._erc1271_signature_checker, hash, signature)
@@ -95,9 +179,9 @@ class SignatureCheckerFuzzTest(FuzzTest):
     @flow(weight=60)
     def flow_check_signature_invalid_modified(self) -> None:
         signer = self._signer.address
-        data = random_bytes(0, 1000)
-        hash = bytearray(keccak256(data))
-        signature = bytearray(self._signer.sign_hash(hash))
+        signed = self._signatures.get()
+        hash = bytearray(signed.hash)
+        signature = bytearray(signed.signature)
         original_v = None
 
         x = random_int(0, 2)
@@ -171,7 +255,74 @@ class SignatureCheckerFuzzTest(FuzzTest):
         assert not self._signature_checker.isValidERC1271SignatureNow__(self._erc1271_signature_checker, hash, v, r, s, from_=signer)
         assert not self._signature_checker.isValidERC1271SignatureNowCalldata(self._erc1271_signature_checker, hash, signature, from_=signer)
 
+    @flow(weight=30)
+    def flow_check_signature_malleated(self) -> None:
+        signed = self._signatures.get()
+        signer = bytes(self._signer.address)
+        signatures = [malleate(signed) for _ in range(self.MALLEATED_BATCH)]
+        expected = is_valid_signature_batch([(signer, signed.hash, signature) for signature in signatures])
+
+        for i in random.sample(range(len(signatures)), self.ONCHAIN_SAMPLE):
+            assert self._signature_checker.isValidSignatureNow(self._signer, signed.hash, signatures[i]) == expected[i]
+            assert self._signature_checker.isValidSignatureNowCalldata(self._signer, signed.hash, signatures[i]) == expected[i]
+
+    @flow(weight=20)
+    def flow_ecdsa_differential(self) -> None:
+        signed = self._signatures.get()
+        hash = signed.hash
+        for signature in [malleate(signed) for _ in range(self.ECDSA_VARIANTS)] + [invalid_length(signed)]:
+            expected = ecdsa_reference.try_recover(hash, signature)
+            assert bytes(self._ecdsa.tryRecover(hash, signature)) == expected
+            assert bytes(self._ecdsa.tryRecoverCalldata(hash, signature)) == expected
+            self._check_recover(expected, self._ecdsa.recover, hash, signature)
+            self._check_recover(expected, self._ecdsa.recoverCalldata, hash, signature)
+
+            canonical = ecdsa_reference.canonical_hash(signature)
+            assert self._ecdsa.canonicalHash(signature) == canonical
+            assert self._ecdsa.canonicalHashCalldata(signature) == canonical
+
+            for account in (self._signer.address, random_address()):
+                assert self._signature_checker.isValidSignatureNow(account, hash, signature) == (
+                    ecdsa_reference.is_valid_signature_now(bytes(account), hash, signature)
+                )
+
+            # the split forms, with the missing parts of short variants taken from the original
+            padded = signature + signed.signature[len(signature):]
+            r, s, v = padded[:32], padded[32:64], padded[64]
+            expected = ecdsa_reference.try_recover_vs(hash, r, s)
+            assert bytes(self._ecdsa.tryRecover_(hash, r, s)) == expected
+            self._check_recover(expected, self._ecdsa.recover_, hash, r, s)
+            assert self._ecdsa.canonicalHash_(r, s) == ecdsa_reference.canonical_hash_vs(r, s)
+
+            expected = ecdsa_reference.try_recover_vrs(hash, v, r, s)
+            assert bytes(self._ecdsa.tryRecover__(hash, v, r, s)) == expected
+            self._check_recover(expected, self._ecdsa.recover__, hash, v, r, s)
+            assert self._ecdsa.canonicalHash__(v, r, s) == ecdsa_reference.canonical_hash_vrs(v, r, s)
+
+    def _check_recover(self, expected: bytes, recover, *args) -> None:
+        # the recover variants revert where tryRecover returns the zero address
+        if expected == ZERO_ADDRESS:
+            with must_revert(UnknownTransactionRevertedError(INVALID_SIGNATURE)):
+                recover(*args)
+        else:
+            assert bytes(recover(*args)) == expected
+
+    @flow(weight=30, max_times=1)
+    def flow_ecdsa_batch(self) -> None:
+        signer = bytes(self._signer.address)
+        items = []
+        for _ in range(self.RECOVER_BATCH // self.MALLEATED_BATCH):
+            signed = self._signatures.get()
+            items.extend((signed.hash, malleate(signed)) for _ in range(self.MALLEATED_BATCH))
+        expected = ecdsa_reference.try_recover_batch(items)
+
+        hashes, signatures = zip(*items)
+        assert [bytes(a) for a in self._ecdsa.tryRecoverBatch(list(hashes), list(signatures))] == expected
+        assert is_valid_signature_batch([(signer, hash, signature) for hash, signature in items]) == [
+            a == signer for a in expected
+        ]
+
 
 @default_chain.connect()
 def test_signature_checker():
-    SignatureCheckerFuzzTest().run(10, 20)
+    SignatureCheckerFuzzTest.run(10, 20)
@@ -0,0 +1,201 @@
+import dataclasses
+from typing import Optional, Tuple
+
+from wake.testing import *
+from wake.testing.fuzzing import *
+
+from . import p256_reference as p256
+from . import webauthn
+from .fuzz_runner import FixtureFuzzTest
+from .utils import LazyContract, use_path, verifier_bytecode
+from .webauthn import EMPTY_AUTH, FLAG_UP, FLAG_UV, Assertion, AssertionPool, WebAuthnAuth
+
+WebAuthnMock = LazyContract("pytypes.tests.WebAuthnMock", "WebAuthnMock")
+WebAuthn = LazyContract("pytypes.src.utils.WebAuthn", "WebAuthn")
+
+
+def to_struct(auth: WebAuthnAuth):
+    return WebAuthn.WebAuthnAuth(
+        bytearray(auth.authenticator_data),
+        auth.client_data_json,
+        auth.challenge_index,
+        auth.type_index,
+        auth.r,
+        auth.s,
+    )
+
+
+def from_struct(auth) -> WebAuthnAuth:
+    return WebAuthnAuth(
+        bytes(auth.authenticatorData),
+        auth.clientDataJSON,
+        auth.challengeIndex,
+        auth.typeIndex,
+        bytes(auth.r),
+        bytes(auth.s),
+    )
+
+
+def _flip_bit(data: bytes) -> bytes:
+    data = bytearray(data)
+    pos = random_int(0, len(data) * 8 - 1)
+    data[pos // 8] ^= 1 << (pos % 8)
+    return bytes(data)
+
+
+def _resign(private_key: int, auth: WebAuthnAuth, **changes) -> WebAuthnAuth:
+    # a field changed and the signature made valid for it again, so only the structural checks can fail
+    return webauthn.sign(private_key, dataclasses.replace(auth, **changes), random)
+
+
+def tamper(assertion: Assertion, private_key: int) -> Tuple[bytes, bool, WebAuthnAuth]:
+    # One modified variant of a valid assertion as (challenge, requireUserVerification, auth), valid or not.
+    challenge = assertion.challenge
+    require_uv = assertion.require_user_verification
+    auth = assertion.auth
+    json = auth.client_data_json
+    x = random_int(0, 10)
+    if x == 0:
+        challenge = _flip_bit(challenge) if challenge else random_bytes(1, 32)
+    elif x == 1:
+        # valid only if the authenticator did verify the user
+        require_uv = True
+    elif x == 2:
+        flags = auth.authenticator_data[32] & ~random.choice([FLAG_UP, FLAG_UV])
+        auth = _resign(private_key, auth, authenticator_data=auth.authenticator_data[:32] + bytes([flags]) + auth.authenticator_data[33:])
+    elif x == 3:
+        field = random.choice(["challenge_index", "type_index"])
+        index = getattr(auth, field) + random.choice([-1, 1, random_int(2, 64)])
+        auth = dataclasses.replace(auth, **{field: max(index, 0)})
+    elif x == 4:
+        patched = json.replace("webauthn.get", random.choice(["webauthn.create", "webauthn.ge", "WEBAUTHN.GET"]))
+        auth = _resign(private_key, auth, client_data_json=patched, challenge_index=patched.index(webauthn.CHALLENGE_PREFIX))
+    elif x == 5:
+        # the challenge's closing quote removed or replaced
+        end = auth.challenge_index + len(webauthn.CHALLENGE_PREFIX) + len(webauthn.base64url(challenge))
+        patched = json[:end] + random.choice(["", "A", "="]) + json[end + 1:]
+        auth = _resign(private_key, auth, client_data_json=patched, type_index=patched.index(webauthn.TYPE_FIELD))
+    elif x == 6:
+        # high-s twin, rejected by P256.verifySignature
+        auth = dataclasses.replace(auth, s=(p256.N - int.from_bytes(auth.s, "big")).to_bytes(32, "big"))
+    elif x == 7:
+        field = random.choice(["authenticator_data", "client_data_json", "r", "s"])
+        if field == "client_data_json":
+            pos = random_int(0, len(json) - 1)
+            auth = dataclasses.replace(auth, client_data_json=json[:pos] + chr(ord(json[pos]) ^ 1) + json[pos + 1:])
+        else:
+            auth = dataclasses.replace(auth, **{field: _flip_bit(getattr(auth, field))})
+    elif x == 8:
+        auth = _resign(private_key, auth, authenticator_data=auth.authenticator_data[:random_int(0, 33)])
+    elif x == 9:
+        # past the end of clientDataJSON or past the addition overflow guard
+        field = random.choice(["challenge_index", "type_index"])
+        auth = dataclasses.replace(auth, **{field: random.choice([len(json), len(json) - 0x14, 2**128, 2**256 - 1])})
+    return challenge, require_uv, auth
+
+
+class WebAuthnFuzzTest(FixtureFuzzTest):
+    # Variants checked offline per flow_verify_tampered, and how many of them are also checked on-chain.
+    TAMPERED_BATCH = 32
+    ONCHAIN_SAMPLE = 4
+
+    _webauthn: WebAuthnMock
+    _private_key: int
+    _x: int
+    _y: int
+    _assertions: Optional[AssertionPool] = None
+
+    def deploy_fixtures(self) -> None:
+        self._webauthn = WebAuthnMock.deploy()
+        # without a native RIP-7212 precompile the verifier is etched in its place, part of the snapshot
+        use_path("precompile", self._webauthn.hasPrecompile(), verifier_bytecode())
+        assert self._webauthn.hasPrecompileOrVerifier()
+
+    def pre_sequence(self) -> None:
+        super().pre_sequence()
+        self._private_key = random_int(1, p256.N - 1)
+        self._x, self._y = p256.public_key(self._private_key)
+        self._close_pool()
+        self._assertions = AssertionPool(self._private_key, random_int(0, 2**64 - 1))
+
+    def post_sequence(self) -> None:
+        try:
+            super().post_sequence()
+        finally:
+            self._close_pool()
+
+    def _close_pool(self) -> None:
+        # the pool signs ahead in worker processes, stop it once the sequence is over. One left open by a
+        # sequence that raised is closed by the next pre_sequence, or at exit by signature_pool.
+        if self._assertions is not None:
+            self._assertions.close()
+            self._assertions = None
+
+    def _verify_all(self, challenge: bytes, require_uv: bool, auth: WebAuthnAuth) -> Tuple[bool, ...]:
+        x = self._x.to_bytes(32, "big")
+        y = self._y.to_bytes(32, "big")
+        struct = to_struct(auth)
+        compact = webauthn.encode_compact(auth)
+        return (
+            self._webauthn.verify(challenge, require_uv, struct, x, y),
+            self._webauthn.verifyEncoded(challenge, require_uv, self._webauthn.encodeAuth(struct), x, y),
+            self._webauthn.verifyCompact(challenge, require_uv, compact, x, y),
+            self._webauthn.verifyCompactCalldata(challenge, require_uv, compact, x, y),
+        )
+
+    @flow()
+    def flow_verify(self) -> None:
+        assertion = self._assertions.get()
+        assert webauthn.verify(assertion.challenge, assertion.require_user_verification, assertion.auth, self._x, self._y)
+        assert self._verify_all(assertion.challenge, assertion.require_user_verification, assertion.auth) == (True,) * 4
+
+    @flow()
+    def flow_encode_decode(self) -> None:
+        auth = self._assertions.get().auth
+        struct = to_struct(auth)
+        compact = webauthn.encode_compact(auth)
+
+        assert self._webauthn.tryEncodeAuthCompact(struct) == compact
+        assert from_struct(self._webauthn.tryDecodeAuthCompact(compact)) == auth
+        assert from_struct(self._webauthn.tryDecodeAuthCompactCalldata(compact)) == auth
+        assert from_struct(self._webauthn.tryDecodeAuth(self._webauthn.encodeAuth(struct))) == auth
+
+        # lengths and indices above 16 bits have no compact encoding
+        field = random.choice(["challenge_index", "type_index"])
+        wide = dataclasses.replace(auth, **{field: random_int(2**16, 2**256 - 1)})
+        assert webauthn.encode_compact(wide) == b""
+        assert self._webauthn.tryEncodeAuthCompact(to_struct(wide)) == b""
+
+    @flow()
+    def flow_decode_malformed(self) -> None:
+        compact = webauthn.encode_compact(self._assertions.get().auth)
+        x = random_int(0, 2)
+        if x == 0:
+            compact = compact[:random_int(0, webauthn.COMPACT_MIN_LENGTH - 1)]
+        elif x == 1:
+            # authenticatorData running into the indices and the signature
+            length = random_int(len(compact) - webauthn.COMPACT_MIN_LENGTH + 1, 2**16 - 1)
+            compact = length.to_bytes(2, "big") + compact[2:]
+        else:
+            # a longer clientDataJSON, still ASCII
+            j = len(compact) - 0x44
+            compact = compact[:j] + bytes(random.choices(b"abc{}\":,", k=random_int(1, 64))) + compact[j:]
+
+        expected = webauthn.decode_compact(compact)
+        assert (expected == EMPTY_AUTH) == (x != 2)
+        assert from_struct(self._webauthn.tryDecodeAuthCompact(compact)) == expected
+        assert from_struct(self._webauthn.tryDecodeAuthCompactCalldata(compact)) == expected
+
+    @flow(weight=60)
+    def flow_verify_tampered(self) -> None:
+        assertion = self._assertions.get()
+        variants = [tamper(assertion, self._private_key) for _ in range(self.TAMPERED_BATCH)]
+        expected = [webauthn.verify(*variant, self._x, self._y) for variant in variants]
+
+        for i in random.sample(range(len(variants)), self.ONCHAIN_SAMPLE):
+            assert self._verify_all(*variants[i]) == (expected[i],) * 4
+
+
+@default_chain.connect()
+def test_webauthn():
+    WebAuthnFuzzTest.run(10, 50)
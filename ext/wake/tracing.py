@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from wake.development.globals import get_config
+from wake.development.json_rpc.communicator import JsonRpcError
+from wake.development.transactions import TransactionAbc
+from wake.testing import Chain, default_chain
+
+# Without --steps-tracing anvil does not trace transactions while mining them and
+# debug_traceTransaction has nothing to return. Traces are only needed when something goes wrong
+# (call traces of failures, resolving errors whose selector is declared in several contracts), so
+# within on_demand_traces() they are produced on demand by re-executing the transaction traced on
+# top of its parent block. wake.toml keeps --steps-tracing, tests run through wake's own run() are
+# not wrapped in on_demand_traces(). Drop the flag locally to try the on-demand mode with the runners.
+
+_fetch_debug_trace_transaction = TransactionAbc._fetch_debug_trace_transaction
+
+
+def steps_tracing() -> bool:
+    config = get_config()
+    return config.testing.cmd != "anvil" or "--steps-tracing" in config.testing.anvil.cmd_args.split()
+
+
+def trace_transaction(tx: TransactionAbc) -> dict:
+    # Geth-style struct log trace of a mined tx, computed by debug_traceCall against the state
+    # before it. With automine every tx has a block of its own, so that state is exact.
+    chain_interface = tx.chain.chain_interface
+    options = {
+        "enableMemory": True,
+        "blockOverrides": {"number": hex(tx.block_number), "time": hex(tx.block.timestamp)},
+    }
+    try:
+        return chain_interface.debug_trace_call(tx._tx_params, tx.block_number - 1, options)
+    except JsonRpcError:
+        # node without block overrides, block.number and block.timestamp are off by one block
+        del options["blockOverrides"]
+        return chain_interface.debug_trace_call(tx._tx_params, tx.block_number - 1, options)
+
+
+def _fetch_debug_trace_on_demand(self: TransactionAbc) -> None:
+    if self._debug_trace_transaction is None and not steps_tracing():
+        self._debug_trace_transaction = trace_transaction(self)
+    _fetch_debug_trace_transaction(self)
+
+
+@contextmanager
+def on_demand_traces() -> Iterator[None]:
+    # Routes every debug trace wake requests (tx.call_trace, error resolution, coverage) through
+    # trace_transaction() while active. Opt-in, for tests that read traces of failures.
+    previous = TransactionAbc._fetch_debug_trace_transaction
+    TransactionAbc._fetch_debug_trace_transaction = _fetch_debug_trace_on_demand
+    try:
+        yield
+    finally:
+        TransactionAbc._fetch_debug_trace_transaction = previous
+
+
+class LastTransaction:
+    # Remembers the last transaction sent on the chain, the one to trace when a check fails.
+    tx: Optional[TransactionAbc]
+
+    def __init__(self, chain: Chain = default_chain):
+        self.tx = None
+        self._chain = chain
+        self._previous_callback = None
+
+    def __enter__(self) -> "LastTransaction":
+        self._previous_callback = self._chain.tx_callback
+        self._chain.tx_callback = self.record
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._chain.tx_callback = self._previous_callback
+
+    def record(self, tx: TransactionAbc) -> None:
+        self.tx = tx
+        if self._previous_callback is not None:
+            self._previous_callback(tx)
+
+
+def format_call_trace(e: BaseException, last_tx: Optional[TransactionAbc]) -> Optional[str]:
+    # Call trace of the tx behind a failure: the reverted tx itself or, for a failed check,
+    # the last tx sent before it. Reverted calls (e.tx is None) have no tx to trace.
+    tx = getattr(e, "tx", last_tx)
+    if tx is None:
+        return None
+    try:
+        return f"call trace of {tx.tx_hash}:\n{tx.call_trace}"
+    except Exception as trace_error:
+        return f"call trace of {tx.tx_hash} unavailable: {trace_error!r}"
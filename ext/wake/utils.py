@@ -1,9 +1,241 @@
-from typing import List, Tuple
+import csv
+import importlib
+import json
+import mmap
+import os
+import re
+import struct
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Generic, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
 
-from wake.testing import keccak256
+from Crypto.Hash import keccak
+from wake.testing import Account, Address, keccak256, random
+
+
+# Levels with more nodes than this are hashed in a process pool.
+PARALLEL_THRESHOLD = 1 << 15
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_processes: Optional[int] = None
+
+
+def hash_pair(a: bytes, b: bytes) -> bytes:
+    return keccak.new(data=a + b if a < b else b + a, digest_bits=256).digest()
+
+
+# Returns the hashes of `leaves` as one contiguous buffer of 32-byte nodes.
+def hash_leaves(leaves: Sequence[bytes], processes: Optional[int] = None) -> bytes:
+    chunks = _split(len(leaves), 1, processes)
+    if len(chunks) <= 1:
+        return _hash_leaves_chunk(leaves)
+    return b"".join(_get_executor(processes).map(_hash_leaves_chunk, [leaves[start:end] for start, end in chunks]))
+
+
+# Hashes a contiguous buffer of 32-byte nodes into the parent level in the same format.
+# Nodes are hashed as sorted pairs, the last node of an odd level is paired with itself.
+def hash_level(nodes: bytes, processes: Optional[int] = None) -> bytes:
+    assert len(nodes) % 32 == 0, "Level must consist of 32-byte nodes"
+    chunks = _split(len(nodes) // 32, 2, processes)
+    if len(chunks) <= 1:
+        return _hash_level_chunk(nodes)
+    return b"".join(_get_executor(processes).map(_hash_level_chunk, [nodes[start * 32:end * 32] for start, end in chunks]))
+
+
+def _hash_leaves_chunk(leaves: Sequence[bytes]) -> bytes:
+    return b"".join(keccak.new(data=leaf, digest_bits=256).digest() for leaf in leaves)
+
+
+def _hash_level_chunk(nodes: bytes) -> bytes:
+    parents = []
+    for offset in range(0, len(nodes), 64):
+        a = nodes[offset:offset + 32]
+        b = nodes[offset + 32:offset + 64] or a
+        parents.append(keccak.new(data=a + b if a < b else b + a, digest_bits=256).digest())
+    return b"".join(parents)
+
+
+# Offline equivalent of MerkleProofLib.verify.
+def verify_proof(proof: Sequence[bytes], root: bytes, leaf: bytes) -> bool:
+    for node in proof:
+        leaf = hash_pair(leaf, node)
+    return leaf == root
+
+
+# Offline equivalent of MerkleProofLib.verifyMultiProof, including its handling of malformed inputs.
+def verify_multiproof(proof: Sequence[bytes], root: bytes, leaves: Sequence[bytes], flags: Sequence[bool]) -> bool:
+    if len(leaves) + len(proof) != len(flags) + 1:
+        return False
+    if len(flags) == 0:
+        return (proof[0] if len(proof) == 1 else leaves[0]) == root
+
+    # the library pops from a queue of leaves followed by computed hashes, reading past its back yields zero words
+    queue = list(leaves)
+    front = 0
+    proof_index = 0
+    for flag in flags:
+        a = queue[front] if front < len(queue) else bytes(32)
+        if flag:
+            b = queue[front + 1] if front + 1 < len(queue) else bytes(32)
+            front += 2
+        else:
+            if proof_index == len(proof):
+                # all proof elements must be consumed exactly
+                return False
+            b = proof[proof_index]
+            proof_index += 1
+            front += 1
+        queue.append(hash_pair(a, b))
+    return queue[-1] == root and proof_index == len(proof)
+
+
+def verify_proofs(items: Sequence[Tuple[Sequence[bytes], bytes, bytes]], processes: Optional[int] = None) -> List[bool]:
+    return _map_chunks(_verify_proofs_chunk, items, processes)
+
+
+def verify_multiproofs(
+    items: Sequence[Tuple[Sequence[bytes], bytes, Sequence[bytes], Sequence[bool]]],
+    processes: Optional[int] = None,
+) -> List[bool]:
+    return _map_chunks(_verify_multiproofs_chunk, items, processes)
+
+
+def _verify_proofs_chunk(items: Sequence[Tuple[Sequence[bytes], bytes, bytes]]) -> List[bool]:
+    return [verify_proof(*item) for item in items]
+
+
+def _verify_multiproofs_chunk(items: Sequence[Tuple[Sequence[bytes], bytes, Sequence[bytes], Sequence[bool]]]) -> List[bool]:
+    return [verify_multiproof(*item) for item in items]
+
+
+def _map_chunks(
+    fn: Callable[[Sequence], List],
+    items: Sequence,
+    processes: Optional[int],
+    threshold: int = PARALLEL_THRESHOLD,
+) -> List:
+    chunks = _split(len(items), 1, processes, threshold)
+    if len(chunks) <= 1:
+        return fn(items)
+    return [result for results in _get_executor(processes).map(fn, [items[start:end] for start, end in chunks]) for result in results]
+
+
+def _split(
+    count: int,
+    align: int,
+    processes: Optional[int],
+    threshold: int = PARALLEL_THRESHOLD,
+) -> List[Tuple[int, int]]:
+    # about four `align`-aligned ranges per worker, or a single range if the work is too small to fan out
+    workers = processes or os.cpu_count() or 1
+    if count <= threshold or workers == 1:
+        return [(0, count)]
+    size = -(-count // (workers * 4))
+    size += -size % align
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def _get_executor(processes: Optional[int]) -> ProcessPoolExecutor:
+    global _executor, _executor_processes
+    if _executor is None or _executor_processes != processes:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(processes)
+        _executor_processes = processes
+    return _executor
+
+
+def _sibling(level: Sequence[bytes], index: int) -> bytes:
+    sibling = index ^ 1
+    return level[sibling] if sibling < len(level) else level[index]
+
+
+def _get_proof(levels: Sequence[Sequence[bytes]], index: int) -> List[bytes]:
+    proof = []
+    for level in levels[:-1]:
+        proof.append(_sibling(level, index))
+        index //= 2
+    return proof
+
+
+def _get_multiproof(levels: Sequence[Sequence[bytes]], indexes: List[int]) -> Tuple[List[bytes], List[bool]]:
+    proof = []
+    flags = []
+    known = indexes
+    assert all(known[i] < known[i + 1] for i in range(len(known) - 1)), "Leaves must be sorted and unique"
+
+    for level in levels[:-1]:
+        new_known = []
+        j = 0
+        while j < len(known):
+            i = known[j]
+            if i % 2 == 0 and j + 1 < len(known) and known[j + 1] == i + 1:
+                # both children are known, the parent is computed from them
+                flags.append(True)
+                j += 2
+            else:
+                flags.append(False)
+                proof.append(_sibling(level, i))
+                j += 1
+            new_known.append(i // 2)
+        known = new_known
+
+    return proof, flags
+
+
+def _iter_proofs(levels: Sequence[Sequence[bytes]]) -> Iterator[List[bytes]]:
+    # Yields the proof of every leaf in order, reusing one list. Moving from leaf `i - 1` to leaf `i` only changes
+    # the siblings on the levels below the lowest set bit of `i`, so the whole export costs O(n) lookups.
+    if len(levels[0]) == 0:
+        return
+    proof = _get_proof(levels, 0)
+    yield proof
+    for i in range(1, len(levels[0])):
+        for depth in range(min((i & -i).bit_length(), len(proof))):
+            proof[depth] = _sibling(levels[depth], i >> depth)
+        yield proof
+
+
+PROOFS_MAGIC = b"MRKLPRFS"
+PROOFS_HEADER = struct.Struct("<8sQQ32s")
+
+
+def _export_proofs(levels: Sequence[Sequence[bytes]], path: Union[str, os.PathLike], format: str) -> None:
+    # binary: header followed by fixed-size proofs, the proof of leaf `i` starts at `header + i * depth * 32`
+    # jsonl: one {"index", "leaf", "proof"} object per line
+    depth = len(levels) - 1
+    if format == "binary":
+        with open(path, "wb") as f:
+            f.write(PROOFS_HEADER.pack(PROOFS_MAGIC, len(levels[0]), depth, levels[-1][0] if levels[0] else bytes(32)))
+            for proof in _iter_proofs(levels):
+                f.write(b"".join(proof))
+    elif format == "jsonl":
+        with open(path, "w") as f:
+            for i, proof in enumerate(_iter_proofs(levels)):
+                f.write(json.dumps({
+                    "index": i,
+                    "leaf": "0x" + levels[0][i].hex(),
+                    "proof": ["0x" + node.hex() for node in proof],
+                }) + "\n")
+    else:
+        raise ValueError(f"Unknown proof export format: {format}")
+
+
+def read_exported_proof(path: Union[str, os.PathLike], index: int) -> Tuple[bytes, List[bytes]]:
+    # returns the root and the proof of leaf `index` from a binary proof export
+    with open(path, "rb") as f:
+        magic, count, depth, root = PROOFS_HEADER.unpack(f.read(PROOFS_HEADER.size))
+        assert magic == PROOFS_MAGIC, "Not a Merkle proofs file"
+        if not 0 <= index < count:
+            raise IndexError("leaf index out of range")
+        f.seek(PROOFS_HEADER.size + index * depth * 32)
+        data = f.read(depth * 32)
+    return root, [data[offset:offset + 32] for offset in range(0, len(data), 32)]
 
 
 class MerkleTree:
+    # Levels are stored unpadded; the last node of an odd level is paired with itself.
+    # Once the tree is built, leaf updates only rehash the path to the root.
     _is_ready: bool
     _leaves: List[bytes]
     _levels: List[List[bytes]]
@@ -26,64 +258,428 @@ class MerkleTree:
     def get_proof(self, index: int) -> List[bytes]:
         if not self._is_ready:
             self._build_tree()
-
-        proof = []
-        for level in self._levels[:-1]:
-            if index % 2 == 0:
-                proof.append(level[index + 1])
-            else:
-                proof.append(level[index - 1])
-            index //= 2
-        return proof
+        return _get_proof(self._levels, index)
 
     def get_multiproof(self, indexes: List[int]) -> Tuple[List[bytes], List[bool]]:
         if not self._is_ready:
             self._build_tree()
+        return _get_multiproof(self._levels, indexes)
 
-        proof = []
-        flags = []
-        known = indexes
-        assert known == sorted(known), "Leaves must be sorted"
-
-        for level in self._levels[:-1]:
-            new_known = []
-            for i in known:
-                if i % 2 == 0:
-                    if i + 1 in known:
-                        flags.append(True)
-                    else:
-                        flags.append(False)
-                        if i + 1 < len(level):
-                            proof.append(level[i + 1])
-                        else:
-                            proof.append(level[i])
-                else:
-                    if i - 1 in known:
-                        pass  # already processed
-                    else:
-                        flags.append(False)
-                        proof.append(level[i - 1])
-                if len(new_known) == 0 or new_known[-1] != i // 2:
-                    new_known.append(i // 2)
-            known = new_known
-
-        return proof, flags
+    def export_proofs(self, path: Union[str, os.PathLike], format: str = "binary") -> None:
+        if not self._is_ready:
+            self._build_tree()
+        _export_proofs(self._levels, path, format)
 
     def add_leaf(self, leaf: bytes):
         self._leaves.append(leaf)
-        self._is_ready = False
+        if self._is_ready:
+            self._levels[0].append(keccak256(leaf))
+            self._update_path(len(self._leaves) - 1)
+
+    def set_leaf(self, index: int, leaf: bytes):
+        self._leaves[index] = leaf
+        if self._is_ready:
+            self._levels[0][index] = keccak256(leaf)
+            self._update_path(index)
 
     def _build_tree(self) -> None:
-        self._levels.append([keccak256(leaf) for leaf in self._leaves])
-        while len(self._levels[-1]) > 1:
-            self._levels.append(self._build_level(self._levels[-1]))
+        nodes = hash_leaves(self._leaves)
+        self._levels = [self._unpack_level(nodes)]
+        while len(nodes) > 32:
+            nodes = hash_level(nodes)
+            self._levels.append(self._unpack_level(nodes))
         self._is_ready = True
 
-    def _build_level(self, level: List[bytes]) -> List[bytes]:
-        if len(level) % 2 == 1:
-            level.append(level[-1])
-        return [
-            keccak256(level[i] + level[i + 1]) if level[i] < level[i + 1]
-            else keccak256(level[i + 1] + level[i])
-            for i in range(0, len(level), 2)
-        ]
+    @staticmethod
+    def _unpack_level(nodes: bytes) -> List[bytes]:
+        return [nodes[offset:offset + 32] for offset in range(0, len(nodes), 32)]
+
+    def _update_path(self, index: int) -> None:
+        depth = 0
+        while len(self._levels[depth]) > 1:
+            level = self._levels[depth]
+            if depth + 1 == len(self._levels):
+                self._levels.append([])
+            parents = self._levels[depth + 1]
+
+            node = hash_pair(level[index], _sibling(level, index))
+            index //= 2
+            if index == len(parents):
+                parents.append(node)
+            else:
+                parents[index] = node
+            depth += 1
+
+
+class _NodeLevel:
+    # read-only view of one level inside a flat buffer of 32-byte nodes
+    __slots__ = ("_view",)
+
+    def __init__(self, view: memoryview):
+        self._view = view
+
+    def __len__(self) -> int:
+        return len(self._view) // 32
+
+    def __getitem__(self, index: int) -> bytes:
+        if not 0 <= index < len(self):
+            raise IndexError("node index out of range")
+        return bytes(self._view[index * 32:index * 32 + 32])
+
+
+class FlatMerkleTree:
+    # Same tree as MerkleTree, but all levels live in one flat buffer of 32-byte nodes (leaf hashes first, root last).
+    # The buffer is saved to disk as-is and reopened through mmap, so proofs can be served without rehashing.
+    MAGIC = b"MRKLTREE"
+    HEADER = struct.Struct("<8sQ")
+
+    _buffer: Union[bytearray, mmap.mmap]
+    _view: memoryview
+    _levels: List[_NodeLevel]
+
+    def __init__(self, buffer: Union[bytearray, mmap.mmap]):
+        magic, count = self.HEADER.unpack_from(buffer)
+        assert magic == self.MAGIC, "Not a Merkle tree file"
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._levels = []
+
+        offset = self.HEADER.size
+        for size in self._level_sizes(count):
+            self._levels.append(_NodeLevel(self._view[offset:offset + size * 32]))
+            offset += size * 32
+        assert offset == len(buffer), "Truncated Merkle tree file"
+
+    @classmethod
+    def build(cls, leaves: Sequence[bytes]) -> "FlatMerkleTree":
+        return cls.from_leaf_hashes(hash_leaves(leaves))
+
+    @classmethod
+    def from_leaf_hashes(cls, nodes: bytes) -> "FlatMerkleTree":
+        buffer = bytearray(cls.HEADER.pack(cls.MAGIC, len(nodes) // 32))
+        buffer += nodes
+        while len(nodes) > 32:
+            nodes = hash_level(nodes)
+            buffer += nodes
+        return cls(buffer)
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> "FlatMerkleTree":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        with open(path, "wb") as f:
+            f.write(self._view)
+
+    def close(self) -> None:
+        for level in self._levels:
+            level._view.release()
+        self._levels = []
+        self._view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __len__(self) -> int:
+        return len(self._levels[0]) if self._levels else 0
+
+    @property
+    def root(self) -> bytes:
+        return self._levels[-1][0]
+
+    def get_leaf_hash(self, index: int) -> bytes:
+        return self._levels[0][index]
+
+    def get_proof(self, index: int) -> List[bytes]:
+        return _get_proof(self._levels, index)
+
+    def get_multiproof(self, indexes: List[int]) -> Tuple[List[bytes], List[bool]]:
+        return _get_multiproof(self._levels, indexes)
+
+    def export_proofs(self, path: Union[str, os.PathLike], format: str = "binary") -> None:
+        _export_proofs(self._levels, path, format)
+
+    @staticmethod
+    def _level_sizes(count: int) -> List[int]:
+        sizes = [count]
+        while sizes[-1] > 1:
+            sizes.append((sizes[-1] + 1) // 2)
+        return sizes
+
+
+class ProofCache:
+    # Bounded LRU cache in front of get_proof/get_multiproof of a MerkleTree or FlatMerkleTree.
+    # Entries are dropped whenever the root changes; callers get copies and may modify them.
+    hits: int
+    misses: int
+    _tree: Union[MerkleTree, FlatMerkleTree]
+    _maxsize: int
+    _root: Optional[bytes]
+    _entries: OrderedDict
+
+    def __init__(self, tree: Union[MerkleTree, FlatMerkleTree], maxsize: int = 4096):
+        self.hits = 0
+        self.misses = 0
+        self._tree = tree
+        self._maxsize = maxsize
+        self._root = None
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_proof(self, index: int) -> List[bytes]:
+        return list(self._get(index, lambda: self._tree.get_proof(index)))
+
+    def get_multiproof(self, indexes: List[int]) -> Tuple[List[bytes], List[bool]]:
+        proof, flags = self._get(tuple(indexes), lambda: self._tree.get_multiproof(indexes))
+        return list(proof), list(flags)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, compute: Callable):
+        root = self._tree.root
+        if root != self._root:
+            self._entries.clear()
+            self._root = root
+
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        return value
+
+
+# Bench tables are exported here, next to the gas profiles when GAS_REPORT_DIR is set.
+REPORT_DIR = os.environ.get("GAS_REPORT_DIR") or os.path.join(".wake", "reports")
+
+
+def format_table(header: Sequence[str], rows: Sequence[Sequence]) -> str:
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def write_table(name: Union[str, os.PathLike], header: Sequence[str], rows: Sequence[Sequence]) -> None:
+    # CSV for *.csv names, a markdown table otherwise, written to REPORT_DIR
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORT_DIR, name)
+    with open(path, "w", newline="") as f:
+        if str(path).endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        else:
+            f.write(format_table(header, rows) + "\n")
+
+
+class CompleteMerkleTree:
+    # Python port of MerkleTreeLib: a complete tree in one array, root first and leaves last in reverse order.
+    # Node `i` has children `2 * i + 1` and `2 * i + 2`, nodes are hashed as sorted pairs and leaves are not hashed.
+    _nodes: bytes
+
+    def __init__(self, nodes: bytes):
+        self._nodes = nodes
+
+    @classmethod
+    def build(cls, leaves: Sequence[bytes]) -> "CompleteMerkleTree":
+        if len(leaves) == 0:
+            raise ValueError("MerkleTreeLeavesEmpty")
+
+        # Reversed, the node array is a stream in which node `l + k` is the parent of nodes `2 * k` and `2 * k + 1`,
+        # so parents can be hashed in batches of whatever pairs are already available.
+        stream = bytearray(b"".join(leaves))
+        consumed = 0
+        remaining = len(leaves) - 1
+        while remaining > 0:
+            pairs = min((len(stream) - consumed) // 64, remaining)
+            stream += hash_level(bytes(stream[consumed:consumed + pairs * 64]))
+            consumed += pairs * 64
+            remaining -= pairs
+
+        nodes = bytearray(len(stream))
+        for offset in range(0, len(stream), 32):
+            nodes[len(stream) - offset - 32:len(stream) - offset] = stream[offset:offset + 32]
+        return cls(bytes(nodes))
+
+    @property
+    def nodes(self) -> List[bytes]:
+        return [self._nodes[offset:offset + 32] for offset in range(0, len(self._nodes), 32)]
+
+    @property
+    def root(self) -> bytes:
+        if len(self._nodes) == 0:
+            raise IndexError("MerkleTreeOutOfBoundsAccess")
+        return self._nodes[:32]
+
+    @property
+    def num_leaves(self) -> int:
+        n = len(self._nodes) // 32
+        return n - (n >> 1)
+
+    @property
+    def num_internal_nodes(self) -> int:
+        return (len(self._nodes) // 32) >> 1
+
+    def leaf(self, leaf_index: int) -> bytes:
+        return self._node(self._leaf_node_index(leaf_index))
+
+    def leaf_proof(self, leaf_index: int) -> List[bytes]:
+        return self.node_proof(self._leaf_node_index(leaf_index))
+
+    def node_proof(self, node_index: int) -> List[bytes]:
+        if not 0 <= node_index < len(self._nodes) // 32:
+            raise IndexError("MerkleTreeOutOfBoundsAccess")
+        proof = []
+        while node_index != 0:
+            proof.append(self._node(node_index - 1 + 2 * (node_index & 1)))
+            node_index = (node_index - 1) >> 1
+        return proof
+
+    def multi_proof_for_leaves(self, leaf_indices: Sequence[int]) -> Tuple[List[bytes], List[bool]]:
+        if len(leaf_indices) == 0:
+            raise ValueError("MerkleTreeInvalidLeafIndices")
+        if any(leaf_indices[i] >= leaf_indices[i + 1] for i in range(len(leaf_indices) - 1)):
+            raise ValueError("MerkleTreeInvalidLeafIndices")
+
+        # node indices in descending order, consumed from the front while parents are appended to the back
+        queue = [self._leaf_node_index(i) for i in leaf_indices]
+        proof = []
+        flags = []
+        current = 0
+        while current < len(queue) and queue[current] != 0:
+            node_index = queue[current]
+            sibling = node_index - 1 + 2 * (node_index & 1)
+            current += 1
+            flag = current < len(queue) and queue[current] == sibling
+            if flag:
+                current += 1
+            else:
+                proof.append(self._node(sibling))
+            flags.append(flag)
+            queue.append((node_index - 1) >> 1)
+        return proof, flags
+
+    def _leaf_node_index(self, leaf_index: int) -> int:
+        if not 0 <= leaf_index < self.num_leaves:
+            raise IndexError("MerkleTreeOutOfBoundsAccess")
+        return len(self._nodes) // 32 - 1 - leaf_index
+
+    def _node(self, index: int) -> bytes:
+        return self._nodes[index * 32:index * 32 + 32]
+
+
+def pad_leaves(leaves: Sequence[bytes], default_fill: bytes = b"\x00" * 32) -> List[bytes]:
+    # port of MerkleTreeLib.pad, pads the leaves to the next power of 2
+    if len(leaves) == 0:
+        raise ValueError("MerkleTreeLeavesEmpty")
+    return list(leaves) + [default_fill] * ((1 << (len(leaves) - 1).bit_length()) - len(leaves))
+
+
+T = TypeVar("T", bound=Hashable)
+
+
+class RandomAccessSet(Generic[T]):
+    # Set with O(1) add, remove and uniform random choice. Items are kept in a list,
+    # removal swaps the last item into the hole (swap-and-pop).
+    __slots__ = ("_items", "_index")
+
+    _items: List[T]
+    _index: Dict[T, int]
+
+    def __init__(self, items: Iterable[T] = ()):
+        self._items = []
+        self._index = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item) -> bool:
+        return item in self._index
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items)
+
+    def add(self, item: T) -> None:
+        if item not in self._index:
+            self._index[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item: T) -> None:
+        i = self._index.pop(item, None)
+        if i is None:
+            return
+        last = self._items.pop()
+        if i < len(self._items):
+            self._items[i] = last
+            self._index[last] = i
+
+    def choice(self) -> T:
+        # Draws from wake's seeded generator, raises IndexError when empty.
+        return random.choice(self._items)
+
+    def sample(self, k: int) -> List[T]:
+        return random.sample(self._items, min(k, len(self._items)))
+
+
+class LazyContract:
+    # Stands in for a pytypes contract class and imports its module on first use, so importing
+    # a test module does not load every binding it references. Attribute access, calls
+    # (deploy, wrapping an address) and isinstance() are forwarded to the real class.
+    __slots__ = ("_module", "_name", "_type")
+
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._type = None
+
+    def load(self) -> type:
+        if self._type is None:
+            self._type = getattr(importlib.import_module(self._module), self._name)
+        return self._type
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __instancecheck__(self, obj) -> bool:
+        return isinstance(obj, self.load())
+
+    def __repr__(self) -> str:
+        return f"LazyContract({self._module}.{self._name})"
+
+
+# Where P256 finds a verifier, shared by the P256 and WebAuthn tests.
+RIP_PRECOMPILE = Address("0x0000000000000000000000000000000000000100")
+VERIFIER = Address("0x000000000000D01eA45F9eFD5c54f037Fa57Ea1a")
+
+
+def verifier_bytecode() -> bytes:
+    # the Solidity verifier test/P256.t.sol etches, read from there to keep a single copy
+    with open(os.path.join("test", "P256.t.sol")) as f:
+        return bytes.fromhex(re.search(r'_VERIFIER_BYTECODE =\s*hex"([0-9a-fA-F]+)"', f.read()).group(1))
+
+
+def use_path(path: str, native_precompile: bool, bytecode: bytes) -> None:
+    # "precompile": the RIP-7212 precompile answers, the verifier is etched in its place when the node lacks it.
+    # "verifier": the precompile address is empty, so P256 falls back to VERIFIER.
+    if path == "precompile":
+        if not native_precompile:
+            Account(RIP_PRECOMPILE).code = bytecode
+        Account(VERIFIER).code = b""
+    else:
+        Account(RIP_PRECOMPILE).code = b""
+        Account(VERIFIER).code = bytecode
@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import random as _random
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from . import p256_reference as p256
+from .signature_pool import BATCH, PresignedPool
+
+# Python side of src/utils/WebAuthn.sol: generates WebAuthn assertions signed with P-256 and
+# mirrors verify() and the compact encoding, so the library can be checked against them offline.
+
+TYPE_FIELD = '"type":"webauthn.get"'
+CHALLENGE_PREFIX = '"challenge":"'
+
+# authenticator data flags, https://www.w3.org/TR/webauthn-2/#flags
+FLAG_UP = 0x01
+FLAG_UV = 0x04
+FLAG_BE = 0x08
+FLAG_BS = 0x10
+FLAG_AT = 0x40
+FLAG_ED = 0x80
+
+# shortest compact encoding: the two length bytes, both indices, r and s
+COMPACT_MIN_LENGTH = 0x46
+
+
+@dataclass(frozen=True)
+class WebAuthnAuth:
+    # WebAuthn.WebAuthnAuth
+    authenticator_data: bytes
+    client_data_json: str
+    challenge_index: int
+    type_index: int
+    r: bytes
+    s: bytes
+
+
+EMPTY_AUTH = WebAuthnAuth(b"", "", 0, 0, bytes(32), bytes(32))
+
+
+@dataclass(frozen=True)
+class Assertion:
+    challenge: bytes
+    require_user_verification: bool
+    auth: WebAuthnAuth
+
+
+def base64url(data: bytes) -> str:
+    # Base64.encode(data, true, true): URL-safe alphabet, no padding
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def authenticator_data(rp_id: str, flags: int, sign_count: int, extra: bytes = b"") -> bytes:
+    # rpIdHash ‖ flags ‖ signCount, then attested credential data or extensions when flagged
+    return hashlib.sha256(rp_id.encode()).digest() + bytes([flags]) + sign_count.to_bytes(4, "big") + extra
+
+
+def client_data_json(challenge: bytes, origin: str, type_first: bool = True, extra: str = "") -> Tuple[str, int, int]:
+    # (clientDataJSON, challengeIndex, typeIndex)
+    challenge_field = f'{CHALLENGE_PREFIX}{base64url(challenge)}"'
+    fields = [TYPE_FIELD, challenge_field] if type_first else [challenge_field, TYPE_FIELD]
+    fields += [f'"origin":"{origin}"', '"crossOrigin":false']
+    if extra:
+        fields.append(extra)
+    json = "{" + ",".join(fields) + "}"
+    return json, json.index(challenge_field), json.index(TYPE_FIELD)
+
+
+def message_hash(auth: WebAuthnAuth) -> bytes:
+    return hashlib.sha256(auth.authenticator_data + hashlib.sha256(auth.client_data_json.encode()).digest()).digest()
+
+
+def verify(challenge: bytes, require_user_verification: bool, auth: WebAuthnAuth, x: int, y: int) -> bool:
+    # WebAuthn.verify, step for step
+    client = auth.client_data_json.encode()
+    n = len(client)
+    c = auth.challenge_index
+    t = auth.type_index
+    if (c | t) >> 128 or not t + 0x14 < n or client[t:t + 0x15] != TYPE_FIELD.encode():
+        return False
+    expected = (CHALLENGE_PREFIX + base64url(challenge)).encode()
+    q = len(expected)
+    if not q + c < n or client[c:c + q] != expected or client[c + q] != ord('"'):
+        return False
+    flags = FLAG_UP | (FLAG_UV if require_user_verification else 0)
+    if len(auth.authenticator_data) <= 0x20 or auth.authenticator_data[0x20] & flags != flags:
+        return False
+    return p256.verify(
+        message_hash(auth), int.from_bytes(auth.r, "big"), int.from_bytes(auth.s, "big"), x, y
+    )
+
+
+def encode_compact(auth: WebAuthnAuth) -> bytes:
+    # WebAuthn.tryEncodeAuthCompact, empty if a length or an index does not fit in 16 bits
+    client = auth.client_data_json.encode()
+    if max(len(auth.authenticator_data), len(client), auth.challenge_index, auth.type_index) >> 16:
+        return b""
+    return (
+        len(auth.authenticator_data).to_bytes(2, "big")
+        + auth.authenticator_data
+        + client
+        + auth.challenge_index.to_bytes(2, "big")
+        + auth.type_index.to_bytes(2, "big")
+        + auth.r
+        + auth.s
+    )
+
+
+def decode_compact(encoded: bytes) -> WebAuthnAuth:
+    # WebAuthn.tryDecodeAuthCompact, EMPTY_AUTH where the library leaves the struct unpopulated
+    if len(encoded) < COMPACT_MIN_LENGTH:
+        return EMPTY_AUTH
+    c = 2 + int.from_bytes(encoded[:2], "big")
+    j = len(encoded) - 0x44
+    if c > j:
+        return EMPTY_AUTH
+    return WebAuthnAuth(
+        encoded[2:c],
+        encoded[c:j].decode(),
+        int.from_bytes(encoded[j:j + 2], "big"),
+        int.from_bytes(encoded[j + 2:j + 4], "big"),
+        encoded[j + 4:j + 36],
+        encoded[j + 36:],
+    )
+
+
+def sign(private_key: int, auth: WebAuthnAuth, rng: _random.Random) -> WebAuthnAuth:
+    hash = message_hash(auth)
+    r = s = 0
+    while r == 0:
+        r, s = p256.sign(private_key, hash, rng.randint(1, p256.N - 1))
+    return WebAuthnAuth(
+        auth.authenticator_data,
+        auth.client_data_json,
+        auth.challenge_index,
+        auth.type_index,
+        r.to_bytes(32, "big"),
+        s.to_bytes(32, "big"),
+    )
+
+
+def generate_assertion(private_key: int, rng: _random.Random) -> Assertion:
+    # A valid assertion with randomized but well-formed fields, in the shapes authenticators and
+    # browsers produce: 32-byte challenges mostly, optional UV and backup flags, extension data,
+    # either field order and unknown trailing members in clientDataJSON.
+    length = 32 if rng.random() < 0.7 else rng.randint(0, 200)
+    challenge = rng.getrandbits(8 * length).to_bytes(length, "big")
+    host = f"{rng.getrandbits(32):08x}.example"
+
+    flags = FLAG_UP | rng.choice([0, FLAG_UV]) | rng.choice([0, FLAG_BE, FLAG_BE | FLAG_BS])
+    extra = b""
+    if rng.random() < 0.2:
+        flags |= FLAG_ED
+        length = rng.randint(1, 300)
+        extra = rng.getrandbits(8 * length).to_bytes(length, "big")
+    data = authenticator_data(host, flags, rng.getrandbits(32), extra)
+
+    member = '"other_keys_can_be_added_here":"do not compare clientDataJSON against a template"'
+    json, challenge_index, type_index = client_data_json(
+        challenge, f"https://{host}", rng.random() < 0.8, member if rng.random() < 0.3 else ""
+    )
+    auth = sign(private_key, WebAuthnAuth(data, json, challenge_index, type_index, b"", b""), rng)
+    return Assertion(challenge, bool(flags & FLAG_UV) and rng.random() < 0.5, auth)
+
+
+def _assertion_batch(private_key: int, seed: int, start: int, count: int) -> List[Assertion]:
+    # item i depends on (seed, i) only, see PresignedPool
+    return [generate_assertion(private_key, _random.Random(seed * 0x100000000 + i)) for i in range(start, start + count)]
+
+
+class AssertionPool(PresignedPool):
+    # Assertions by one P-256 key, generated and signed ahead in the shared process pool.
+    def __init__(self, private_key: int, seed: int, size: int = 8 * BATCH):
+        super().__init__(_assertion_batch, (private_key,), seed, size)
+
+    def get(self) -> Assertion:
+        return super().get()